@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Define utilities to cache query results on local disk."""
+
+# pylint: disable=invalid-name,dangerous-default-value
+# pylint: disable=too-many-locals,unused-argument
+
+import hashlib
+import json
+import os
+import re
+import time
+from glob import glob
+from typing import Dict, List, Union
+
+import pandas as pd
+
+CACHE_FILE_EXT = ".parquet"
+CACHE_STATS_FNAME = "query_cache_stats.json"
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace in query, so formatting does not change its key.
+
+    Whitespace inside quoted string literals and identifiers is kept.
+    """
+    query_normalized = re.sub(
+        r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|\s+""",
+        lambda m: m.group(1) or " ",
+        query,
+    )
+    query_normalized = query_normalized.strip().rstrip(";").strip()
+    return query_normalized
+
+
+def get_local_tables_state(
+    local_tables: Dict[str, str]
+) -> Dict[str, List[List[Union[str, int]]]]:
+    """Get path, modification time and size of files of local tables.
+
+    Files are found from the path or glob pattern of every table, so a new
+    or changed snapshot of a table changes its state.
+    """
+    tables_state = {}
+    for table_id, fpath_pattern in sorted(local_tables.items()):
+        tables_state[table_id] = [[fpath_pattern]] + [
+            [f, os.stat(f).st_mtime_ns, os.stat(f).st_size]
+            for f in sorted(glob(fpath_pattern))
+        ]
+    return tables_state
+
+
+def get_query_cache_key(
+    query: str,
+    gcp_project_id: str,
+    backend: str = "bigquery",
+    local_tables: Dict[str, str] = {},
+    arrow_dtypes: bool = False,
+) -> str:
+    """Get content-address (hash) of query and inputs that change results.
+
+    Inputs are the normalized query text, project, backend, datatypes of
+    results and, for the local backend, the files of the local tables.
+    """
+    key_inputs = {
+        "gcp_project_id": str(gcp_project_id),
+        "backend": backend,
+        "query": normalize_query(query),
+        "arrow_dtypes": arrow_dtypes,
+        "local_tables": (
+            get_local_tables_state(local_tables) if backend == "duckdb" else {}
+        ),
+    }
+    key_str = json.dumps(key_inputs, sort_keys=True)
+    cache_key = hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+    return cache_key
+
+
+def get_cache_stats(cache_dir: str) -> Dict[str, int]:
+    """Load hit, miss and eviction counts of query results cache."""
+    stats_fpath = os.path.join(cache_dir, CACHE_STATS_FNAME)
+    cache_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+    if os.path.exists(stats_fpath):
+        with open(stats_fpath, encoding="utf-8") as f:
+            cache_stats.update(json.load(f))
+    return cache_stats
+
+
+def update_cache_stats(cache_dir: str, **counts: int) -> Dict[str, int]:
+    """Increment hit, miss and eviction counts of query results cache."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_stats = get_cache_stats(cache_dir)
+    for k, v in counts.items():
+        cache_stats[k] = cache_stats.get(k, 0) + v
+    with open(
+        os.path.join(cache_dir, CACHE_STATS_FNAME), "w", encoding="utf-8"
+    ) as f:
+        json.dump(cache_stats, f)
+    return cache_stats
+
+
+def summarize_cache(cache_dir: str) -> pd.DataFrame:
+    """Get size of query results cache and its hit & miss statistics."""
+    cache_stats = get_cache_stats(cache_dir)
+    fpaths = glob(os.path.join(cache_dir, f"*{CACHE_FILE_EXT}"))
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    df = pd.DataFrame.from_records(
+        [
+            {
+                **cache_stats,
+                "hit_rate": (
+                    100 * cache_stats["hits"] / lookups if lookups else None
+                ),
+                "num_entries": len(fpaths),
+                "size_mb": sum(os.path.getsize(f) for f in fpaths) / 1e6,
+            }
+        ]
+    )
+    return df
+
+
+def read_cached_query_results(
+    cache_dir: str,
+    cache_key: str,
+    ttl_seconds: Union[int, None] = 86_400,
+    arrow_dtypes: bool = False,
+) -> Union[pd.DataFrame, None]:
+    """Load query results from cache, if present and not expired."""
+    fpath = os.path.join(cache_dir, f"{cache_key}{CACHE_FILE_EXT}")
+    if not os.path.exists(fpath):
+        update_cache_stats(cache_dir, misses=1)
+        return None
+    # file modification time is the time at which query results were cached
+    fstat = os.stat(fpath)
+    age_seconds = time.time() - fstat.st_mtime
+    if ttl_seconds is not None and age_seconds > ttl_seconds:
+        os.remove(fpath)
+        update_cache_stats(cache_dir, misses=1, expired=1)
+        return None
+    df = pd.read_parquet(
+        fpath,
+        engine="pyarrow",
+        **({"dtype_backend": "pyarrow"} if arrow_dtypes else {}),
+    )
+    # file access time is the time at which results were last used, which
+    # is needed for LRU eviction
+    os.utime(fpath, (time.time(), fstat.st_mtime))
+    update_cache_stats(cache_dir, hits=1)
+    return df
+
+
+def evict_cached_query_results(
+    cache_dir: str, max_size_mb: float = 1_000
+) -> List[str]:
+    """Remove least recently used query results until cache fits size."""
+    fpaths = sorted(
+        glob(os.path.join(cache_dir, f"*{CACHE_FILE_EXT}")),
+        key=os.path.getatime,
+    )
+    sizes = [os.path.getsize(f) for f in fpaths]
+    cache_size = sum(sizes)
+    evicted = []
+    for fpath, size in zip(fpaths, sizes):
+        if cache_size <= max_size_mb * 1e6:
+            break
+        os.remove(fpath)
+        cache_size -= size
+        evicted.append(fpath)
+    if evicted:
+        update_cache_stats(cache_dir, evicted=len(evicted))
+    return evicted
+
+
+def write_cached_query_results(
+    df: pd.DataFrame,
+    cache_dir: str,
+    cache_key: str,
+    max_size_mb: float = 1_000,
+) -> str:
+    """Save query results to cache, then evict entries to fit cache size."""
+    os.makedirs(cache_dir, exist_ok=True)
+    fpath = os.path.join(cache_dir, f"{cache_key}{CACHE_FILE_EXT}")
+    # write to temporary file first, so partial files are never read
+    fpath_tmp = f"{fpath}.{os.getpid()}.tmp"
+    df.to_parquet(fpath_tmp, index=False, engine="pyarrow")
+    os.replace(fpath_tmp, fpath)
+    _ = evict_cached_query_results(cache_dir, max_size_mb)
+    return fpath
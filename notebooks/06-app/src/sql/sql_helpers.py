@@ -9,27 +9,234 @@
 
 import os
 from datetime import datetime
-from typing import Union
+from typing import Dict, Iterator, List, Union
 
 import pandas as pd
+import pyarrow as pa
 import pytz
+from google.cloud import bigquery, bigquery_storage
+
+import src.sql.query_cache_helpers as qch
+
+
+def get_local_sql_query(query: str, local_tables: Dict[str, str]) -> str:
+    """Translate BigQuery SQL to DuckDB SQL that reads local Parquet files.
+
+    Tables in the query (eg. data-to-insights.ecommerce.web_analytics) are
+    replaced by the Parquet files (path or glob pattern) they are mapped to
+    in local_tables. EXTRACT(DAYOFWEEK ...) is rewritten to follow the
+    BigQuery convention (1=Sunday, ..., 7=Saturday).
+    """
+    import sqlglot
+    from sqlglot import exp
+
+    def to_local(node: exp.Expression) -> exp.Expression:
+        # read table from local Parquet files
+        if isinstance(node, exp.Table):
+            table_id = ".".join(
+                p for p in [node.catalog, node.db, node.name] if p
+            )
+            if table_id in local_tables:
+                return exp.Table(
+                    this=exp.Anonymous(
+                        this="read_parquet",
+                        expressions=[
+                            exp.Literal.string(local_tables[table_id])
+                        ],
+                    ),
+                    alias=node.args.get("alias"),
+                )
+        # get BigQuery day of week (1-7 starting on Sunday) from ISO day of
+        # week (1-7 starting on Monday)
+        if isinstance(node, exp.Extract) and node.name.upper() == "DAYOFWEEK":
+            isodow = exp.Extract(
+                this=exp.var("ISODOW"), expression=node.expression
+            )
+            return exp.Paren(
+                this=exp.Add(
+                    this=exp.Paren(
+                        this=exp.Mod(
+                            this=isodow, expression=exp.Literal.number(7)
+                        )
+                    ),
+                    expression=exp.Literal.number(1),
+                )
+            )
+        return node
+
+    expression = sqlglot.parse_one(query, read="bigquery").transform(to_local)
+    query_local = expression.sql(dialect="duckdb")
+    return query_local
+
+
+def run_local_sql_query(
+    query: str, local_tables: Dict[str, str], arrow_dtypes: bool = False
+) -> pd.DataFrame:
+    """Run BigQuery SQL on local Parquet files using DuckDB."""
+    import duckdb
+
+    query_local = get_local_sql_query(query, local_tables)
+    con = duckdb.connect(database=":memory:")
+    try:
+        if arrow_dtypes:
+            table = con.execute(query_local).arrow()
+            if isinstance(table, pa.RecordBatchReader):
+                table = table.read_all()
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            df = con.execute(query_local).df()
+    finally:
+        con.close()
+    return df
+
+
+def get_bigquery_clients(
+    gcp_project_id: str, gcp_creds: Union[os.PathLike, None]
+) -> List[Union[bigquery.Client, bigquery_storage.BigQueryReadClient]]:
+    """Create BigQuery and BigQuery Storage Read API clients."""
+    client = bigquery.Client(project=gcp_project_id, credentials=gcp_creds)
+    bqstorage_client = bigquery_storage.BigQueryReadClient(
+        credentials=gcp_creds
+    )
+    return [client, bqstorage_client]
+
+
+def get_query_rows(
+    query: str, client: bigquery.Client
+) -> bigquery.table.RowIterator:
+    """Run query on BigQuery and get iterator over its results."""
+    job_config = bigquery.QueryJobConfig(use_query_cache=True)
+    rows = client.query(query, job_config=job_config).result()
+    return rows
+
+
+def stream_query_record_batches(
+    query: str,
+    client: bigquery.Client,
+    bqstorage_client: Union[bigquery_storage.BigQueryReadClient, None] = None,
+    max_queue_size: int = 1,
+) -> Iterator[pa.RecordBatch]:
+    """Run query on BigQuery and stream results as Arrow record batches.
+
+    With a BigQuery Storage Read API client, results are downloaded from
+    parallel read streams (one worker thread per stream) and at most
+    max_queue_size batches per stream are buffered. Otherwise, results are
+    paged through the (slower) REST API.
+    """
+    rows = get_query_rows(query, client)
+    yield from rows.to_arrow_iterable(
+        bqstorage_client=bqstorage_client, max_queue_size=max_queue_size
+    )
+
+
+def fetch_query_arrow_table(
+    query: str,
+    client: bigquery.Client,
+    bqstorage_client: Union[bigquery_storage.BigQueryReadClient, None] = None,
+) -> pa.Table:
+    """Run query on BigQuery and return results as pyarrow.Table.
+
+    Empty results keep the columns and datatypes of the query results.
+    """
+    rows = get_query_rows(query, client)
+    if not rows.total_rows:
+        # table is created from schema of (empty) results
+        return rows.to_arrow()
+    batches = list(rows.to_arrow_iterable(bqstorage_client=bqstorage_client))
+    table = pa.Table.from_batches(batches)
+    return table
+
+
+def execute_sql_query(
+    query: str,
+    gcp_project_id: str,
+    gcp_creds: Union[os.PathLike, None],
+    backend: str = "bigquery",
+    local_tables: Dict[str, str] = {},
+    arrow_dtypes: bool = False,
+    bq_clients: List = [],
+) -> pd.DataFrame:
+    """Execute query using the BigQuery or local (DuckDB) backend.
+
+    With arrow_dtypes=True, results are fetched as Arrow record batches
+    (from the BigQuery Storage Read API) and returned with pd.ArrowDtype
+    columns. The clients used to fetch them can be passed in bq_clients,
+    otherwise they are created from the project ID and credentials.
+    """
+    if backend == "bigquery" and arrow_dtypes:
+        client, bqstorage_client = bq_clients or get_bigquery_clients(
+            gcp_project_id, gcp_creds
+        )
+        df = fetch_query_arrow_table(
+            query, client, bqstorage_client
+        ).to_pandas(types_mapper=pd.ArrowDtype)
+    elif backend == "bigquery":
+        df = pd.read_gbq(
+            query,
+            project_id=gcp_project_id,
+            credentials=gcp_creds,
+            dialect="standard",
+            configuration={"query": {"useQueryCache": True}},
+            # use_bqstorage_api=True,
+        )
+    elif backend == "duckdb":
+        df = run_local_sql_query(query, local_tables, arrow_dtypes)
+    else:
+        raise ValueError(f"Unsupported query backend {backend}")
+    return df
 
 
 def run_sql_query(
-    query: str, gcp_project_id: str, gcp_creds: Union[os.PathLike, None]
+    query: str,
+    gcp_project_id: str,
+    gcp_creds: Union[os.PathLike, None],
+    backend: str = "bigquery",
+    local_tables: Dict[str, str] = {},
+    cache_dir: str = "",
+    cache_ttl_seconds: Union[int, None] = 86_400,
+    cache_max_size_mb: float = 1_000,
+    arrow_dtypes: bool = False,
+    bq_clients: List = [],
 ) -> pd.DataFrame:
-    """Run query on BigQuery and return results as pandas.DataFrame."""
+    """Run query on BigQuery and return results as pandas.DataFrame.
+
+    With backend='duckdb', the same query is instead run locally against
+    Parquet snapshots of the tables it uses (see get_local_sql_query()).
+
+    If cache_dir is specified, results are cached in that directory, keyed by
+    the normalized query text and the inputs that change its results, so
+    repeated queries are loaded from disk (see query_cache_helpers).
+
+    If arrow_dtypes is True, results are fetched and returned with Arrow
+    datatypes (see execute_sql_query()).
+    """
     start_time = datetime.now(pytz.timezone("US/Eastern"))
     start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S.%f")
     print(f"Query execution start time = {start_time_str[:-3]}...", end="")
-    df = pd.read_gbq(
-        query,
-        project_id=gcp_project_id,
-        credentials=gcp_creds,
-        dialect="standard",
-        configuration={"query": {"useQueryCache": True}},
-        # use_bqstorage_api=True,
-    )
+    df = None
+    if cache_dir:
+        cache_key = qch.get_query_cache_key(
+            query, gcp_project_id, backend, local_tables, arrow_dtypes
+        )
+        df = qch.read_cached_query_results(
+            cache_dir, cache_key, cache_ttl_seconds, arrow_dtypes
+        )
+    if df is None:
+        df = execute_sql_query(
+            query,
+            gcp_project_id,
+            gcp_creds,
+            backend,
+            local_tables,
+            arrow_dtypes,
+            bq_clients,
+        )
+        if cache_dir:
+            _ = qch.write_cached_query_results(
+                df, cache_dir, cache_key, cache_max_size_mb
+            )
+    else:
+        print("loaded from cache...", end="")
     end_time = datetime.now(pytz.timezone("US/Eastern"))
     end_time_str = end_time.strftime("%Y-%m-%d %H:%M:%S.%f")
     duration = end_time - start_time
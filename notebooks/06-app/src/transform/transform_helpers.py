@@ -27,7 +27,21 @@ def map_columns(df: pd.DataFrame, mapper_dict: Dict) -> pd.DataFrame:
     return df
 
 
-def extract_data(query: str, gcp_auth_dict: Dict) -> pd.DataFrame:
-    """Retrieve data from Google BigQuery dataset."""
-    df = sq.run_sql_query(query, **gcp_auth_dict)
+def extract_data(
+    query: str,
+    gcp_auth_dict: Dict,
+    backend: str = "bigquery",
+    local_tables: Dict[str, str] = {},
+    cache_dir: str = "",
+    arrow_dtypes: bool = False,
+) -> pd.DataFrame:
+    """Retrieve data from Google BigQuery dataset (or local snapshot)."""
+    df = sq.run_sql_query(
+        query,
+        **gcp_auth_dict,
+        backend=backend,
+        local_tables=local_tables,
+        cache_dir=cache_dir,
+        arrow_dtypes=arrow_dtypes,
+    )
     return df
@@ -11,9 +11,10 @@
 import os
 from typing import Dict, List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from stats_helpers import calc_chisquared_sample_size
+import stats_helpers as sth
 
 
 def calc_sample_size_multiple_audience_groups(
@@ -40,7 +41,7 @@ def calc_sample_size_multiple_audience_groups(
         "uplift": uplift,
         "power": power,
         "ci_level": ci_level,
-        "required_sample_size": calc_chisquared_sample_size(
+        "required_sample_size": sth.calc_chisquared_sample_size(
             conv_rate_pct, uplift, power, ci_level
         ),
     }
@@ -73,7 +74,7 @@ def calc_sample_size_single_audience_group(
         "uplift": uplift_pct,
         "power": power_pct,
         "ci_level": confidence_level_pct,
-        "required_sample_size": calc_chisquared_sample_size(
+        "required_sample_size": sth.calc_chisquared_sample_size(
             conv_rate_pct, uplift_pct, power_pct, confidence_level_pct
         ),
     }
@@ -155,6 +156,33 @@ def get_kpi_per_audience_group(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def expand_sample_size_grid(
+    df_groups: pd.DataFrame,
+    uplift_range: Tuple[int],
+    power_range: Tuple[int],
+    ci_level_range: Tuple[int],
+) -> pd.DataFrame:
+    """Calculate sample sizes for every audience group and grid of inputs."""
+    df_grid = pd.MultiIndex.from_product(
+        [uplift_range, power_range, ci_level_range],
+        names=["uplift", "power", "ci_level"],
+    ).to_frame(index=False)
+    # repeat each audience group once per combination of inputs
+    df = df_groups.loc[df_groups.index.repeat(len(df_grid))].reset_index(
+        drop=True
+    )
+    for c in list(df_grid):
+        df[c] = np.tile(df_grid[c].to_numpy(), len(df_groups))
+    # get sample sizes for all groups and inputs in a single call
+    df["required_sample_size"] = sth.calc_chisquared_sample_sizes(
+        df["group_conv_rate"].to_numpy(dtype=np.float64, na_value=np.nan),
+        df["uplift"].to_numpy(),
+        df["power"].to_numpy(),
+        df["ci_level"].to_numpy(),
+    )
+    return df
+
+
 def calculate_multi_group_sample_sizes(
     df_kpis: pd.DataFrame,
     uplift_range: Tuple[int],
@@ -162,39 +190,28 @@ def calculate_multi_group_sample_sizes(
     ci_level_range: Tuple[int],
 ) -> pd.DataFrame:
     """Calculate sample size for low, mid & high-propensity audience group."""
-    df = pd.DataFrame.from_records(
-        [
-            calc_sample_size_multiple_audience_groups(
-                row["group_number"],
-                row["total_visitors"],
-                row["min_score"],
-                row["conversion_rate"],
-                row["ctr"],
-                row["revenue"],
-                row["bounce_rate"],
-                uplift,
-                power,
-                ci_level,
-            )
-            for _, row in df_kpis.iterrows()
-            for uplift in uplift_range
-            for power in power_range
-            for ci_level in ci_level_range
-        ]
+    df_groups = pd.DataFrame(
+        {
+            "group_number": df_kpis["group_number"].to_numpy(),
+            "group_size": df_kpis["total_visitors"].to_numpy(),
+            "group_min_propensity": df_kpis["min_score"].to_numpy(),
+            "group_conv_rate": df_kpis["conversion_rate"].to_numpy(),
+            "ctr": df_kpis["ctr"].to_numpy(),
+            "revenue": df_kpis["revenue"].to_numpy(),
+            "bounce_rate": df_kpis["bounce_rate"].to_numpy(),
+        }
+    )
+    df = expand_sample_size_grid(
+        df_groups, uplift_range, power_range, ci_level_range
     )
     return df
 
 
-def calculate_single_group_sample_sizes(
-    df: pd.DataFrame,
-    num_groups: int,
-    audience_group_size: int,
-    uplift_range: Tuple[int],
-    power_range: Tuple[int],
-    confidence_level_range: Tuple[int],
+def get_top_group_kpis(
+    df: pd.DataFrame, num_groups: int, audience_group_size: int
 ) -> pd.DataFrame:
-    """Calculate sample sizes for high-propensity audience group."""
-    top_group_sample_size_records = []
+    """Calculate KPIs for bins with upper N% of (sorted) samples."""
+    top_group_records = []
     for audience_group_number in range(1, (num_groups + 1)):
         # get bin (or group) size to capture upper N% of samples (visitors)
         current_bin_size = audience_group_size * audience_group_number
@@ -218,25 +235,92 @@ def calculate_single_group_sample_sizes(
         # get first-visit revenue per group
         binned_revenue = audience_group_visitors["revenue"].sum()
 
-        # get sample sizes
-        for uplift in uplift_range:
-            for power in power_range:
-                for ci_level in confidence_level_range:
-                    sample_size_dict = calc_sample_size_single_audience_group(
-                        audience_group_number,
-                        current_bin_size,
-                        100 * current_bin_size / len(df),
-                        audience_group_visitors["score"].min(),
-                        binned_conversion_rate,
-                        binned_ctr,
-                        binned_revenue,
-                        binned_bounce_rate,
-                        uplift,
-                        power,
-                        ci_level,
-                    )
-                    top_group_sample_size_records.append(sample_size_dict)
-    df_sample_sizes = pd.DataFrame.from_records(top_group_sample_size_records)
+        top_group_records.append(
+            {
+                "group_number": audience_group_number,
+                "group_size": current_bin_size,
+                "group_size_proportion": 100 * current_bin_size / len(df),
+                "group_min_propensity": audience_group_visitors["score"].min(),
+                "group_conv_rate": binned_conversion_rate,
+                "ctr": binned_ctr,
+                "revenue": binned_revenue,
+                "bounce_rate": binned_bounce_rate,
+            }
+        )
+    df_top_group_kpis = pd.DataFrame.from_records(top_group_records)
+    return df_top_group_kpis
+
+
+def get_top_group_kpis_cumulative(
+    df: pd.DataFrame, num_groups: int, audience_group_size: int
+) -> pd.DataFrame:
+    """Calculate KPIs for bins with upper N% of samples from cumulative sums.
+
+    Equal to get_top_group_kpis() up to floating-point round-off, since
+    each column is accumulated once over the (sorted) samples instead of
+    being summed for every bin. KPIs for every bin are read from the
+    cumulative arrays at the last row of that bin.
+    """
+    # get (zero-based) position of last row in each bin with upper N% of
+    # samples (visitors)
+    group_numbers = np.arange(1, num_groups + 1)
+    bin_sizes = audience_group_size * group_numbers
+    last_rows = bin_sizes - 1
+
+    # get running totals of first-visit activity, up to the last row of bin
+    conversions, clicks, views, bounces, revenue = [
+        np.cumsum(arr)[last_rows]
+        for arr in [
+            df["label"].eq(1).fillna(False).to_numpy(dtype=bool),
+            df["product_clicks"].fillna(0).to_numpy(),
+            df["product_views"].fillna(0).to_numpy(),
+            df["bounces"].fillna(0).to_numpy(),
+            df["revenue"].fillna(0).to_numpy(),
+        ]
+    ]
+    # get running minimum score, up to the last row of bin
+    min_scores = np.fmin.accumulate(
+        df["score"].to_numpy(dtype=np.float64, na_value=np.nan)
+    )[last_rows]
+
+    df_top_group_kpis = pd.DataFrame(
+        {
+            "group_number": group_numbers,
+            "group_size": bin_sizes,
+            "group_size_proportion": 100 * bin_sizes / len(df),
+            "group_min_propensity": min_scores,
+            "group_conv_rate": 100 * conversions / bin_sizes,
+            "ctr": 100 * clicks / views,
+            "revenue": revenue,
+            "bounce_rate": 100 * (bounces / bin_sizes),
+        }
+    )
+    return df_top_group_kpis
+
+
+def calculate_single_group_sample_sizes(
+    df: pd.DataFrame,
+    num_groups: int,
+    audience_group_size: int,
+    uplift_range: Tuple[int],
+    power_range: Tuple[int],
+    confidence_level_range: Tuple[int],
+    use_cumulative_sums: bool = True,
+) -> pd.DataFrame:
+    """Calculate sample sizes for high-propensity audience group."""
+    # get KPIs for bins with upper N% of samples (visitors)
+    if use_cumulative_sums:
+        df_top_group_kpis = get_top_group_kpis_cumulative(
+            df, num_groups, audience_group_size
+        )
+    else:
+        df_top_group_kpis = get_top_group_kpis(
+            df, num_groups, audience_group_size
+        )
+    # get sample sizes
+    df_sample_sizes = expand_sample_size_grid(
+        df_top_group_kpis, uplift_range, power_range, confidence_level_range
+    )
     return df_sample_sizes
 
 
@@ -10,6 +10,7 @@
 from functools import reduce
 from typing import Dict, List, Union
 
+import numpy as np
 import pandas as pd
 
 
@@ -25,28 +26,115 @@ def get_categorical_string_to_int_mapping(
     return df
 
 
+def encode_categorical(
+    s: pd.Series,
+    cat_mapper_dict: Dict[str, int],
+    unseen_code: Union[int, None] = None,
+) -> pd.arrays.IntegerArray:
+    """Encode categorical as integers from mapper, using categorical codes.
+
+    Missing values are encoded as missing. Categories not in the mapper
+    (eg. new categories found at inference) are encoded as unseen_code, or
+    as missing if it is not specified.
+    """
+    ints = np.fromiter(cat_mapper_dict.values(), dtype=np.int64)
+    codes = pd.Categorical(s, categories=list(cat_mapper_dict)).codes
+    is_mapped = codes >= 0
+    values = ints.take(codes, mode="clip") if len(ints) else codes
+    values = np.where(is_mapped, values, 0).astype(np.int64)
+    if unseen_code is not None:
+        is_unseen = ~is_mapped & s.notna().to_numpy()
+        values[is_unseen] = unseen_code
+        is_mapped |= is_unseen
+    return pd.arrays.IntegerArray(values, mask=~is_mapped)
+
+
+def decode_categorical(
+    s: pd.Series, cat_mapper_dict: Dict[str, int]
+) -> pd.api.extensions.ExtensionArray:
+    """Decode integers into categories from mapper, using a lookup array.
+
+    Integers that are missing or not in the mapper are decoded as missing.
+    """
+    ints = np.fromiter(cat_mapper_dict.values(), dtype=np.int64)
+    # infer datatype of categories once, from mapper
+    categories = pd.Series(list(cat_mapper_dict)).array
+    max_int = ints.max() if len(ints) else -1
+    # position of each integer's category, with unknown integers at -1
+    lookup = np.full(max_int + 2, -1)
+    lookup[ints] = np.arange(len(ints))
+    values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    is_known = (values >= 0) & (values <= max_int)
+    positions = np.where(is_known, values, max_int + 1).astype(np.int64)
+    return categories.take(lookup.take(positions), allow_fill=True)
+
+
 def cast_categoricals_as_ints(
     df: pd.DataFrame, categoricals: List[str] = []
 ) -> List[Union[pd.DataFrame, List[Dict[str, int]]]]:
-    """Cast categoricals as integers."""
+    """Cast categoricals as integers.
+
+    The mapper of a column has all of its (declared) categories, including
+    categories that are not used in the data, so integers are the same as
+    with cast_categoricals_as_ints_incremental().
+    """
     cat_mapper_dicts = []
     if categoricals:
         for cat_col in categoricals:
-            cat_mapper_dict = dict(
-                zip(
-                    df[cat_col].cat.categories.tolist(),
-                    range(df[cat_col].nunique()),
-                )
-            )
-            df[cat_col] = (
-                df[cat_col].map(cat_mapper_dict)
-                # .astype(pd.Int8Dtype())
-                .astype(pd.Int64Dtype())
+            categories = df[cat_col].cat.categories.tolist()
+            cat_mapper_dict = dict(zip(categories, range(len(categories))))
+            # integers are the categorical codes
+            codes = df[cat_col].cat.codes.to_numpy().astype(np.int64)
+            is_mapped = codes >= 0
+            df[cat_col] = pd.arrays.IntegerArray(
+                np.where(is_mapped, codes, 0), mask=~is_mapped
             )
             cat_mapper_dicts.append({cat_col: cat_mapper_dict})
     return [df, cat_mapper_dicts]
 
 
+def cast_categoricals_as_ints_with_mappers(
+    df: pd.DataFrame,
+    cat_mapper_dicts: List[Dict[str, Dict[str, int]]],
+    unseen_code: Union[int, None] = None,
+) -> pd.DataFrame:
+    """Cast categoricals as integers, using mappers from training data.
+
+    Categories not seen in training data are encoded as unseen_code, or as
+    missing if it is not specified.
+    """
+    for map_dict in cat_mapper_dicts:
+        for k, v in map_dict.items():
+            df[k] = encode_categorical(df[k], v, unseen_code)
+    return df
+
+
+def cast_categoricals_as_ints_incremental(
+    df: pd.DataFrame,
+    cat_mapper_dicts: Dict[str, Dict[str, int]],
+    categoricals: List[str] = [],
+) -> pd.DataFrame:
+    """Cast categoricals as integers, extending mappers with new categories.
+
+    Used to encode a stream of batches. Categories in the mapper for a column
+    keep their integer, and categories not seen in earlier batches are given
+    the next integers (in the order of the column's categories). For
+    categoricals, all (declared) categories are added, as with
+    cast_categoricals_as_ints(), even if they are not used in the batch.
+    """
+    for cat_col in categoricals:
+        cat_mapper_dict = cat_mapper_dicts.setdefault(cat_col, {})
+        if isinstance(df[cat_col].dtype, pd.CategoricalDtype):
+            batch_categories = df[cat_col].cat.categories
+        else:
+            batch_categories = np.sort(df[cat_col].dropna().unique())
+        for c in batch_categories:
+            if c not in cat_mapper_dict:
+                cat_mapper_dict[c] = len(cat_mapper_dict)
+        df[cat_col] = encode_categorical(df[cat_col], cat_mapper_dict)
+    return df
+
+
 def combine_categorical_str_to_int_mappers(
     mappers: List[List],
     dfs_list: List[pd.DataFrame],
@@ -69,5 +157,5 @@ def cast_categoricals_as_strings(
     """Cast categoricals as strings."""
     for map_dict in cat_mapper_dicts:
         for k, v in map_dict.items():
-            df[k] = df[k].map({c_int: c for c, c_int in v.items()})
+            df[k] = pd.Series(decode_categorical(df[k], v), index=df.index)
     return df
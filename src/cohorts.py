@@ -8,7 +8,8 @@
 # pylint: disable=too-many-locals,unused-argument
 
 
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Union
 
 import numpy as np
 import pandas as pd
@@ -81,87 +82,137 @@ def get_required_inputs(df: pd.DataFrame, query_inputs: str) -> pd.DataFrame:
     return df
 
 
+def assign_cohorts(
+    num_visitors: int, grp_size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Assign visitors to control (0), test (1) or excluded (2) cohorts.
+
+    Visitors are assigned by their position in the audience group, from a
+    single random permutation of the group.
+    """
+    if 2 * grp_size > num_visitors:
+        raise ValueError(
+            f"Cannot draw control and test cohorts of size {grp_size:,} "
+            f"from audience group of size {num_visitors:,}"
+        )
+    shuffled_positions = rng.permutation(num_visitors)
+    cohort_codes = np.full(num_visitors, 2, dtype=np.int8)
+    control_positions, test_positions, _ = np.split(
+        shuffled_positions, [grp_size, 2 * grp_size]
+    )
+    cohort_codes[control_positions] = 0
+    cohort_codes[test_positions] = 1
+    return cohort_codes
+
+
+def get_group_cohorts(
+    audience_rows: np.ndarray,
+    grp_size: int,
+    seed_seq: np.random.SeedSequence,
+) -> List[np.ndarray]:
+    """Get rows and cohorts of audience group, ordered by cohort."""
+    rng = np.random.default_rng(seed_seq)
+    cohort_codes = assign_cohorts(len(audience_rows), grp_size, rng)
+    # order as control, test and excluded visitors
+    cohort_order = np.argsort(cohort_codes, kind="stable")
+    return [audience_rows[cohort_order], cohort_codes[cohort_order]]
+
+
 def create_cohorts(
     df_group_sizes: pd.DataFrame,
     df: pd.DataFrame,
     mapper_dict_audience: Dict[int, str],
     audience_strategy: int,
+    seed: int = 88,
+    executor_type: str = "",
+    max_workers: Union[int, None] = None,
 ) -> pd.DataFrame:
-    """Create audience cohorts."""
+    """Create audience cohorts.
+
+    Audience groups are processed sequentially, or in parallel if
+    executor_type is 'thread' or 'process'. Each group draws cohorts from
+    its own random stream spawned from seed, so cohorts are the same with
+    or without parallel processing.
+    """
     if df_group_sizes.empty:
         print("Found no suitable sample sizes, so did not generate cohorts.")
         data_cols = [c for c in list(df) if c not in ["row_number"]]
         new_cols = ["cohort", "audience_strategy"]
         df_infer_audience_grps = pd.DataFrame(columns=data_cols + new_cols)
     else:
-        groups = []
         cohort_sizes = df_group_sizes["required_sample_size"].tolist()
+        cohort_names = np.array(["Control", "Test", None], dtype=object)
+        # get positions of rows in each audience group, in a single pass
+        group_rows = df.groupby("maudience", sort=False).indices
+        audience_rows = [
+            group_rows.get(k, np.array([], dtype=np.intp))
+            for k in range(len(cohort_sizes))
+        ]
+
+        # 0. scale required sample size based on ratio of group sizes in
+        # unseen to base datasets
+        grp_sizes = []
         for k, grp_size in enumerate(cohort_sizes):
-            df_audience = df.query(f"maudience == {k}")
-            audience_array = df_audience["fullvisitorid"].to_numpy()
-
-            # 0. scale required sample size based on ratio of group sizes in
-            # unseen to base datasets
             base_group_size = df_group_sizes.query(f"group_number == {k}")[
                 "group_size"
             ].iloc[0]
-            infer_group_size = len(df_audience)
-            grp_size = int(grp_size * infer_group_size / base_group_size)
-
-            # 1. get control group (visitors)
-            rng = np.random.default_rng(88)
-            control_grp = rng.choice(
-                audience_array, grp_size, replace=False
-            ).tolist()
-
-            # 2. get all other visitors
-            other_grp = list(set(audience_array) - set(control_grp))
-
-            # 3. get test group from a random sample of the other visitors
-            rng = np.random.default_rng(88)
-            test_grp = rng.choice(other_grp, grp_size, replace=False).tolist()
+            infer_group_size = len(audience_rows[k])
+            grp_sizes.append(
+                int(grp_size * infer_group_size / base_group_size)
+            )
 
-            # 4. get combined control and test cohorts of visitors
-            combined_cohort = control_grp + test_grp
-            # get all excluded visitors (not part of test or control cohort)
-            excluded_grp = list(set(audience_array) - set(combined_cohort))
+        # 1. get control, test and excluded cohorts of visitors from a
+        # single permutation of each audience group
+        seed_seqs = np.random.SeedSequence(seed).spawn(len(cohort_sizes))
+        if executor_type:
+            executors = {
+                "thread": ThreadPoolExecutor,
+                "process": ProcessPoolExecutor,
+            }
+            if executor_type not in executors:
+                raise ValueError(
+                    f"Unsupported executor type: {executor_type}. "
+                    f"Use one of {list(executors)}"
+                )
+            with executors[executor_type](max_workers=max_workers) as ex:
+                groups = list(
+                    ex.map(
+                        get_group_cohorts, audience_rows, grp_sizes, seed_seqs
+                    )
+                )
+        else:
+            groups = list(
+                map(get_group_cohorts, audience_rows, grp_sizes, seed_seqs)
+            )
 
+        for k, (_, cohort_codes) in enumerate(groups):
+            cohort_sizes_k = np.bincount(cohort_codes, minlength=3)
             print(
                 f"audience={k}: {mapper_dict_audience[k]}, "
-                f"size={len(audience_array):,}, ",
-                f"excluded={len(excluded_grp):,}, "
-                f"wanted={grp_size:,}, "
-                f"control={len(control_grp):,}, "
-                f"test={len(test_grp):,}",
+                f"size={len(cohort_codes):,}, ",
+                f"excluded={cohort_sizes_k[2]:,}, "
+                f"wanted={grp_sizes[k]:,}, "
+                f"control={cohort_sizes_k[0]:,}, "
+                f"test={cohort_sizes_k[1]:,}",
             )
 
-            # 5. get extract attributes for each cohort per audience group
-            df_test = (
-                df_audience.drop(columns=["row_number"])
-                .query("fullvisitorid.isin(@test_grp)")
-                .assign(maudience=k)
-                .assign(cohort="Test")
-            )
-            df_control = (
-                df_audience.drop(columns=["row_number"])
-                .query("fullvisitorid.isin(@control_grp)")
-                .assign(maudience=k)
-                .assign(cohort="Control")
-            )
-            df_excluded = (
-                df_audience.drop(columns=["row_number"])
-                .query("fullvisitorid.isin(@excluded_grp)")
-                .assign(maudience=k)
-                .assign(cohort=None)
-            )
-            df_coh = pd.concat(
-                [df_control, df_test, df_excluded], ignore_index=True
-            )
-            groups.append(df_coh)
+        # 2. get extract attributes for each cohort per audience group, by
+        # selecting rows of all groups at once
+        rows = np.concatenate([rows_k for rows_k, _ in groups])
         df_infer_audience_grps = (
-            pd.concat(groups, ignore_index=True)
+            df.drop(columns=["row_number"])
+            .iloc[rows]
+            .reset_index(drop=True)
+            .assign(
+                maudience=np.repeat(
+                    [mapper_dict_audience[k] for k in range(len(groups))],
+                    [len(rows_k) for rows_k, _ in groups],
+                )
+            )
             .assign(
-                maudience=lambda df: df["maudience"].map(mapper_dict_audience)
+                cohort=cohort_names[
+                    np.concatenate([codes_k for _, codes_k in groups])
+                ]
             )
             .assign(audience_strategy=audience_strategy)
         )
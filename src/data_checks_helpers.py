@@ -9,13 +9,14 @@
 # pylint: disable=missing-class-docstring
 
 import json
+import os
+from collections import Counter
 from datetime import datetime
 from typing import Dict, List, Union
 
-import evidently.tests as eaits
+import numpy as np
 import pandas as pd
 import pytz
-from evidently.test_suite import TestSuite
 from scipy import spatial, stats
 
 
@@ -30,24 +31,47 @@ def detect_features_drift(
     ),
     wsd_threshold: float = 0.5,
     jsd_threshold: float = 0.5,
+    vectorized: bool = True,
+    kst_method_selection: bool = False,
+    kst_refer_size: Union[int, None] = None,
+    seed: int = 88,
 ) -> pd.DataFrame:
-    """Perform checks for drift in features, using reference dataset."""
-    len_smaller_dataset = min(len(refer_data), len(curr_data))
+    """Perform checks for drift in features, using reference dataset.
+
+    With kst_method_selection, the Kolmogorov-Smirnov test method is chosen
+    from sizes of the datasets if kst_params has method='auto' (see
+    get_ks_test_method()), and the reference data is first subsampled to
+    kst_refer_size values, if given. The method and reference size used are
+    reported.
+    """
+    if vectorized:
+        return detect_features_drift_vectorized(
+            curr_data,
+            refer_data,
+            numericals,
+            categoricals,
+            kst_threshold,
+            kst_params,
+            wsd_threshold,
+            jsd_threshold,
+            kst_method_selection,
+            kst_refer_size,
+            seed,
+        )
+    rng = np.random.default_rng(seed)
     categorical_stats_summary = []
     for c in categoricals:
         # get drift stats
         if len(curr_data) <= 1_000:
             csd = None
         else:
+            # compare category frequencies, aligned on all categories
+            curr_hist, refer_hist = get_aligned_histograms(
+                CategoryHistogram([c]).update(curr_data),
+                CategoryHistogram([c]).update(refer_data),
+            )
             jsd = spatial.distance.jensenshannon(
-                curr_data[c]
-                .astype("int64")  # int16
-                .head(len_smaller_dataset)
-                .to_numpy(),
-                refer_data[c]
-                .astype("int64")  # int16
-                .head(len_smaller_dataset)
-                .to_numpy(),
+                curr_hist[:, 0], refer_hist[:, 0]
             )
         # get summary stats
         summary_stats = {
@@ -96,8 +120,15 @@ def detect_features_drift(
             refer_data[c].to_numpy(),
             curr_data[c].to_numpy(),
         ]
-        if len(curr_data) <= 1_000:
-            kst = stats.kstest(refer_data_arr, curr_data_arr, **kst_params)
+        kst_info = {}
+        if len(curr_data) <= 1_000 and kst_method_selection:
+            kst_pvalue, kst_info = get_ks_test(
+                refer_data_arr, curr_data_arr, kst_params, kst_refer_size, rng
+            )
+        elif len(curr_data) <= 1_000:
+            kst_pvalue = stats.kstest(
+                refer_data_arr, curr_data_arr, **kst_params
+            ).pvalue
         else:
             wsd = stats.wasserstein_distance(refer_data_arr, curr_data_arr)
         # get summary stats
@@ -110,7 +141,7 @@ def detect_features_drift(
             "pct_diff_std": feat_desc_stats["pct_diff"]["std"],
             "abs_diff_mean": feat_desc_stats["abs_diff"]["mean"],
             "abs_diff_std": feat_desc_stats["abs_diff"]["std"],
-            "metric_value": kst.pvalue if len(curr_data) <= 1_000 else wsd,
+            "metric_value": kst_pvalue if len(curr_data) <= 1_000 else wsd,
             "metric_threshold": kst_threshold
             if len(curr_data) <= 1_000
             else wsd_threshold,
@@ -128,7 +159,7 @@ def detect_features_drift(
                 .assign(drift_detected=lambda df: df["reject_null"])
                 .assign(test_type="Kolmogorov-Smirnov")
             )
-            for k, v in kst_params.items():
+            for k, v in {**kst_params, **kst_info}.items():
                 df_num_stats[k] = v
         else:
             df_num_stats = df_num_stats.assign(
@@ -146,17 +177,756 @@ def detect_features_drift(
     return [df_num_stats, df_cat_stats]
 
 
-def check_data_stability(
+def get_stratified_sample(
+    arr: np.ndarray, size: Union[int, None], rng: np.random.Generator
+) -> np.ndarray:
+    """Get sample of values, with one value drawn from every stratum.
+
+    Sorted values are split into size strata of equal width in rank, so the
+    sample follows the distribution of all values.
+    """
+    if size is None or len(arr) <= size:
+        return arr
+    arr_sorted = np.sort(arr)
+    positions = (np.arange(size) + rng.random(size)) * len(arr) / size
+    return arr_sorted[positions.astype(np.int64)]
+
+
+def get_ks_test_method(
+    num_refer: int,
+    num_curr: int,
+    method: str = "auto",
+    max_exact_pairs: int = 100_000_000,
+    min_asymp_size: int = 100,
+) -> str:
+    """Choose Kolmogorov-Smirnov test method from sizes of both samples.
+
+    A method other than 'auto' is always used as given. With 'auto', an
+    exact test is used while the number of pairs of values is small enough
+    for it to be fast. Otherwise, the asymptotic distribution is used if
+    the effective sample size is large enough for it to be accurate, and a
+    permutation test is used if not.
+    """
+    if method != "auto":
+        return method
+    if num_refer * num_curr <= max_exact_pairs:
+        return "exact"
+    if num_refer * num_curr / (num_refer + num_curr) >= min_asymp_size:
+        return "asymp"
+    return "permutation"
+
+
+def get_ks_test_permutation(
+    refer_arr: np.ndarray,
+    curr_arr: np.ndarray,
+    alternative: str = "two-sided",
+    num_permutations: int = 999,
+    rng: Union[np.random.Generator, None] = None,
+) -> List[float]:
+    """Perform two-sample Kolmogorov-Smirnov test by permuting samples.
+
+    Statistics of all permutations are calculated at once, from the sorted
+    values of both samples.
+    """
+    if np.isnan(refer_arr).any() or np.isnan(curr_arr).any():
+        return [np.nan, np.nan]
+    rng = rng or np.random.default_rng()
+    values = np.concatenate([refer_arr, curr_arr])
+    order = np.argsort(values, kind="stable")
+    # compare CDFs after the last of every run of tied values
+    is_last_tie = np.append(np.diff(values[order]) != 0, True)
+    # first row has the observed samples, others have permuted samples
+    is_curr = np.tile(order >= len(refer_arr), (num_permutations + 1, 1))
+    is_curr[1:] = rng.permuted(is_curr[1:], axis=1)
+    cdf_diffs = (
+        np.cumsum(~is_curr, axis=1) / len(refer_arr)
+        - np.cumsum(is_curr, axis=1) / len(curr_arr)
+    )[:, is_last_tie]
+    if alternative == "greater":
+        ks_stats = cdf_diffs.max(axis=1)
+    elif alternative == "less":
+        ks_stats = -cdf_diffs.min(axis=1)
+    else:
+        ks_stats = np.abs(cdf_diffs).max(axis=1)
+    pvalue = (np.sum(ks_stats[1:] >= ks_stats[0]) + 1) / (num_permutations + 1)
+    return [ks_stats[0], pvalue]
+
+
+def get_ks_test(
+    refer_arr: np.ndarray,
+    curr_arr: np.ndarray,
+    kst_params: Dict[str, Union[str, int]],
+    kst_refer_size: Union[int, None] = None,
+    rng: Union[np.random.Generator, None] = None,
+    max_permutation_size: int = 10_000,
+) -> List[Union[float, Dict[str, Union[str, int]]]]:
+    """Perform Kolmogorov-Smirnov test with method chosen from sample sizes.
+
+    Missing values are dropped from both samples. The reference sample is
+    then subsampled to kst_refer_size values, if given, and to
+    max_permutation_size values for a permutation test. Returns p-value,
+    and method and size of reference sample used. The p-value is NaN, and
+    the method is None, if either sample has no values.
+    """
+    refer_arr, curr_arr = [
+        pd.Series(arr).dropna().to_numpy(dtype=np.float64)
+        for arr in [refer_arr, curr_arr]
+    ]
+    if not len(refer_arr) or not len(curr_arr):
+        return [
+            np.nan,
+            {"kst_method_used": None, "kst_refer_size": len(refer_arr)},
+        ]
+    rng = rng or np.random.default_rng()
+    refer_arr = get_stratified_sample(refer_arr, kst_refer_size, rng)
+    method = get_ks_test_method(
+        len(refer_arr), len(curr_arr), kst_params.get("method", "auto")
+    )
+    if method == "permutation":
+        refer_arr = get_stratified_sample(refer_arr, max_permutation_size, rng)
+        _, pvalue = get_ks_test_permutation(
+            refer_arr,
+            curr_arr,
+            kst_params.get("alternative", "two-sided"),
+            rng=rng,
+        )
+    else:
+        pvalue = stats.kstest(
+            refer_arr, curr_arr, **{**kst_params, "method": method}
+        ).pvalue
+    kst_info = {"kst_method_used": method, "kst_refer_size": len(refer_arr)}
+    return [pvalue, kst_info]
+
+
+def get_wasserstein_distances_sorted(
+    u_sorted: np.ndarray, v_sorted: np.ndarray
+) -> np.ndarray:
+    """Get Wasserstein distance between columns of two sorted 2D arrays.
+
+    Same as scipy.stats.wasserstein_distance() for each column, with data
+    already sorted so every column is only sorted once.
+    """
+    distances = np.empty(u_sorted.shape[1])
+    for k in range(u_sorted.shape[1]):
+        u, v = u_sorted[:, k], v_sorted[:, k]
+        # merge both sorted arrays (a stable sort only merges sorted runs)
+        merged_order = np.argsort(np.concatenate([u, v]), kind="stable")
+        all_values = np.concatenate([u, v])[merged_order]
+        deltas = np.diff(all_values)
+        # CDFs of both distributions, at every observed value
+        is_u = merged_order < len(u)
+        u_cdf = np.cumsum(is_u)[:-1] / len(u)
+        v_cdf = np.cumsum(~is_u)[:-1] / len(v)
+        distances[k] = np.sum(np.abs(u_cdf - v_cdf) * deltas)
+    return distances
+
+
+def get_nunique_sorted(arr_sorted: np.ndarray) -> np.ndarray:
+    """Count unique values in columns of sorted 2D array, skipping NaNs."""
+    is_valid = ~np.isnan(arr_sorted)
+    is_new_value = (np.diff(arr_sorted, axis=0) != 0) & is_valid[1:]
+    nunique = is_new_value.sum(axis=0) + is_valid.any(axis=0)
+    return nunique
+
+
+class CategoryHistogram:
+    """Count categories of categorical features, over one or more batches."""
+
+    def __init__(self, categoricals: List[str]):
+        """
+        Initializes CategoryHistogram.
+
+        Args:
+            categoricals: names of categorical features (columns) to count
+        """
+        self.categoricals = categoricals
+        # position of each category in counts, by feature
+        self.categories = {c: {} for c in categoricals}
+        self.counts = {c: np.zeros(0, dtype=np.int64) for c in categoricals}
+
+    def update(self, df: pd.DataFrame):
+        """Add counts of categories in a batch of data, skipping missing."""
+        for c in self.categoricals:
+            codes, uniques = pd.factorize(df[c])
+            cat_positions = self.categories[c]
+            for u in uniques:
+                cat_positions.setdefault(u, len(cat_positions))
+            # positions of categories found in batch
+            positions = np.fromiter(
+                (cat_positions[u] for u in uniques),
+                dtype=np.int64,
+                count=len(uniques),
+            )
+            batch_counts = np.bincount(
+                positions.take(codes[codes >= 0]),
+                minlength=len(cat_positions),
+            )
+            counts = np.zeros(len(cat_positions), dtype=np.int64)
+            counts[: len(self.counts[c])] = self.counts[c]
+            self.counts[c] = counts + batch_counts
+        return self
+
+    def nunique(self) -> np.ndarray:
+        """Get number of categories found in every categorical feature."""
+        return np.array(
+            [(self.counts[c] > 0).sum() for c in self.categoricals]
+        )
+
+
+def get_aligned_histograms(
+    curr_hist: CategoryHistogram, refer_hist: CategoryHistogram
+) -> List[np.ndarray]:
+    """Get category counts of features, aligned on union of categories.
+
+    Counts of a feature are in the same column of the returned 2D arrays,
+    padded with zero counts to the largest number of categories.
+    """
+    aligned_counts = []
+    for c in refer_hist.categoricals:
+        # reference categories, followed by new categories in current data
+        categories = dict(refer_hist.categories[c])
+        for u in curr_hist.categories[c]:
+            categories.setdefault(u, len(categories))
+        curr_positions = np.fromiter(
+            (categories[u] for u in curr_hist.categories[c]),
+            dtype=np.int64,
+            count=len(curr_hist.categories[c]),
+        )
+        curr_counts = np.zeros(len(categories))
+        curr_counts[curr_positions] = curr_hist.counts[c]
+        refer_counts = np.zeros(len(categories))
+        refer_counts[: len(refer_hist.counts[c])] = refer_hist.counts[c]
+        aligned_counts.append([curr_counts, refer_counts])
+    num_categories = max([len(c) for c, _ in aligned_counts], default=0)
+    curr_arr, refer_arr = [
+        np.zeros((num_categories, len(aligned_counts))) for _ in range(2)
+    ]
+    for k, (curr_counts, refer_counts) in enumerate(aligned_counts):
+        curr_arr[: len(curr_counts), k] = curr_counts
+        refer_arr[: len(refer_counts), k] = refer_counts
+    return [curr_arr, refer_arr]
+
+
+def get_categorical_drift(
+    curr_hist: CategoryHistogram,
+    refer_hist: CategoryHistogram,
+    jsd_threshold: float = 0.5,
+) -> pd.DataFrame:
+    """Check for drift in categorical features, from category counts.
+
+    Counts can be accumulated over batches of current data, so drift is
+    tracked without holding all data in memory.
+    """
+    curr_arr, refer_arr = get_aligned_histograms(curr_hist, refer_hist)
+    jsd = spatial.distance.jensenshannon(refer_arr, curr_arr, axis=0)
+    df_cat_stats = pd.DataFrame(
+        {
+            "feature_type": "categorical",
+            "feature": refer_hist.categoricals,
+            "nunique_ref": refer_hist.nunique(),
+            "nunique_curr": curr_hist.nunique(),
+            "metric_value": jsd,
+            "metric_threshold": jsd_threshold,
+            "drift_detected": jsd > jsd_threshold,
+            "test_type": "Jensen-Shannon",
+        }
+    )
+    return df_cat_stats
+
+
+def detect_features_drift_vectorized(
     curr_data: pd.DataFrame,
     refer_data: pd.DataFrame,
     numericals: List[str],
     categoricals: List[str],
+    kst_threshold: float = 0.05,
+    kst_params: Dict[str, Union[str, int]] = dict(
+        method="exact", N=20, alternative="two-sided"
+    ),
+    wsd_threshold: float = 0.5,
+    jsd_threshold: float = 0.5,
+    kst_method_selection: bool = False,
+    kst_refer_size: Union[int, None] = None,
+    seed: int = 88,
 ) -> pd.DataFrame:
-    """Check subset of features for data stability using reference dataset."""
-    ts_cols_eai = categoricals + numericals
-    start_time = datetime.now(pytz.timezone("US/Eastern"))
-    start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-    print(f"Test suite start time = {start_time_str[:-3]}...", end="")
+    """Perform checks for drift in all features at once.
+
+    Same as detect_features_drift(vectorized=False).
+    """
+    is_small_curr = len(curr_data) <= 1_000
+    df_cat_stats = pd.DataFrame()
+    if categoricals and not is_small_curr:
+        df_cat_stats = get_categorical_drift(
+            CategoryHistogram(categoricals).update(curr_data),
+            CategoryHistogram(categoricals).update(refer_data),
+            jsd_threshold,
+        )
+
+    df_num_stats = pd.DataFrame()
+    if numericals:
+        # get descriptive stats and drift stats for all features at once
+        refer_arr, curr_arr = [
+            df[numericals].to_numpy(dtype=np.float64, na_value=np.nan)
+            for df in [refer_data, curr_data]
+        ]
+        # missing values are skipped, as in describe()
+        refer_mean, curr_mean = [
+            np.nanmean(arr, axis=0) for arr in [refer_arr, curr_arr]
+        ]
+        refer_std, curr_std = [
+            np.nanstd(arr, axis=0, ddof=1) for arr in [refer_arr, curr_arr]
+        ]
+        refer_sorted, curr_sorted = [
+            np.sort(arr, axis=0) for arr in [refer_arr, curr_arr]
+        ]
+        if is_small_curr and kst_method_selection:
+            rng = np.random.default_rng(seed)
+            ksts = [
+                get_ks_test(
+                    refer_sorted[:, k],
+                    curr_arr[:, k],
+                    kst_params,
+                    kst_refer_size,
+                    rng,
+                )
+                for k in range(len(numericals))
+            ]
+            metric_values = np.array([pvalue for pvalue, _ in ksts])
+            metric_threshold = kst_threshold
+        elif is_small_curr:
+            metric_values = np.array(
+                [
+                    stats.kstest(
+                        refer_arr[:, k], curr_arr[:, k], **kst_params
+                    ).pvalue
+                    for k in range(len(numericals))
+                ]
+            )
+            metric_threshold = kst_threshold
+        else:
+            metric_values = get_wasserstein_distances_sorted(
+                refer_sorted, curr_sorted
+            )
+            metric_threshold = wsd_threshold
+        num_stats = {
+            "feature_type": "numerical",
+            "feature": numericals,
+            "nunique_ref": get_nunique_sorted(refer_sorted),
+            "nunique_curr": get_nunique_sorted(curr_sorted),
+            "pct_diff_mean": 100 * (refer_mean - curr_mean) / refer_mean,
+            "pct_diff_std": 100 * (refer_std - curr_std) / refer_std,
+            "abs_diff_mean": refer_mean - curr_mean,
+            "abs_diff_std": refer_std - curr_std,
+            "metric_value": metric_values,
+            "metric_threshold": metric_threshold,
+        }
+        # check if drift is present
+        if is_small_curr:
+            num_stats["reject_null"] = metric_values < metric_threshold
+            num_stats["drift_detected"] = num_stats["reject_null"]
+            num_stats["test_type"] = "Kolmogorov-Smirnov"
+            num_stats.update(kst_params)
+            if kst_method_selection:
+                for k in ["kst_method_used", "kst_refer_size"]:
+                    num_stats[k] = [kst_info[k] for _, kst_info in ksts]
+        else:
+            num_stats["drift_detected"] = metric_values > metric_threshold
+            num_stats["test_type"] = "Wasserstein"
+        df_num_stats = pd.DataFrame(num_stats)
+    return [df_num_stats, df_cat_stats]
+
+
+def get_reference_profile(
+    refer_data: pd.DataFrame,
+    numericals: List[str],
+    categoricals: List[str],
+    num_quantiles: int = 1_000,
+) -> Dict:
+    """Get compact profile of reference data, to check drift against it.
+
+    Numerical features are summarized by quantiles (at num_quantiles + 1
+    evenly spaced levels, including the minimum and maximum), mean,
+    standard deviation and number of unique values. Categorical features
+    are summarized by category counts. Missing values are counted for all
+    features. The profile only contains lists and numbers, so it can be
+    exported to JSON. It only supports drift checks, since data stability
+    checks (check_data_stability()) need the rows of the reference data.
+    """
+    quantile_levels = np.linspace(0, 1, num_quantiles + 1)
+    profile = {
+        "num_rows": len(refer_data),
+        "quantile_levels": quantile_levels.tolist(),
+        "numericals": {},
+        "categoricals": {},
+    }
+    if numericals:
+        refer_arr = refer_data[numericals].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        refer_sorted = np.sort(refer_arr, axis=0)
+        quantiles = np.nanquantile(refer_arr, quantile_levels, axis=0)
+        for k, c in enumerate(numericals):
+            profile["numericals"][c] = {
+                "null_count": int(np.isnan(refer_arr[:, k]).sum()),
+                "mean": float(np.nanmean(refer_arr[:, k])),
+                "std": float(np.nanstd(refer_arr[:, k], ddof=1)),
+                "nunique": int(get_nunique_sorted(refer_sorted[:, [k]])[0]),
+                "quantiles": quantiles[:, k].tolist(),
+            }
+    if categoricals:
+        refer_hist = CategoryHistogram(categoricals).update(refer_data)
+        for c in categoricals:
+            profile["categoricals"][c] = {
+                "null_count": int(refer_data[c].isna().sum()),
+                # convert numpy scalars, so categories can be exported
+                "categories": [
+                    u.item() if isinstance(u, np.generic) else u
+                    for u in refer_hist.categories[c]
+                ],
+                "counts": refer_hist.counts[c].tolist(),
+            }
+    return profile
+
+
+def get_profile_histogram(
+    refer_profile: Dict, categoricals: List[str]
+) -> CategoryHistogram:
+    """Get category counts of categorical features in reference profile."""
+    refer_hist = CategoryHistogram(categoricals)
+    for c in categoricals:
+        cat_profile = refer_profile["categoricals"][c]
+        refer_hist.categories[c] = {
+            u: k for k, u in enumerate(cat_profile["categories"])
+        }
+        refer_hist.counts[c] = np.array(cat_profile["counts"], dtype=np.int64)
+    return refer_hist
+
+
+def get_quantile_cdf(
+    values: np.ndarray,
+    quantiles: np.ndarray,
+    quantile_levels: np.ndarray,
+    side: str = "right",
+) -> np.ndarray:
+    """Evaluate CDF interpolated linearly between (sorted) quantiles.
+
+    Repeated quantiles, from values that are common in discrete data, are
+    jumps in the CDF. With side='left', limits of the CDF from the left are
+    returned instead of CDF values.
+    """
+    unique_quantiles, first = np.unique(quantiles, return_index=True)
+    last = (
+        len(quantiles) - 1 - np.unique(quantiles[::-1], return_index=True)[1]
+    )
+    # CDF just before and at every unique quantile
+    levels_before, levels_at = quantile_levels[first], quantile_levels[last]
+    # interpolate between consecutive unique quantiles, below and above
+    upper = np.clip(
+        np.searchsorted(unique_quantiles, values, side),
+        0,
+        len(unique_quantiles) - 1,
+    )
+    lower = np.maximum(upper - 1, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = (values - unique_quantiles[lower]) / (
+            unique_quantiles[upper] - unique_quantiles[lower]
+        )
+    cdf = levels_at[lower] + (levels_before[upper] - levels_at[lower]) * frac
+    # CDF is 0 below the minimum and 1 above the maximum
+    if side == "left":
+        cdf[values <= unique_quantiles[0]] = 0
+        cdf[values > unique_quantiles[-1]] = 1
+    else:
+        cdf[values < unique_quantiles[0]] = 0
+        cdf[values >= unique_quantiles[-1]] = 1
+    return cdf
+
+
+def get_ks_test_from_quantiles(
+    curr_arr: np.ndarray,
+    refer_quantiles: np.ndarray,
+    quantile_levels: np.ndarray,
+    alternative: str = "two-sided",
+    method: str = "exact",
+) -> List[float]:
+    """Perform one-sample Kolmogorov-Smirnov test against reference CDF.
+
+    The reference CDF is interpolated between reference quantiles (see
+    get_quantile_cdf()). The statistic compares CDFs at every unique value
+    of current data, so ties in discrete data are handled. Without ties, it
+    is the same as stats.kstest(curr_arr, cdf), and p-values come from the
+    same distributions. alternative is relative to the reference CDF, as
+    in stats.kstest(refer_arr, curr_arr). Missing values are dropped.
+    """
+    curr_arr = curr_arr[~np.isnan(curr_arr)]
+    if not len(curr_arr) or np.isnan(refer_quantiles).any():
+        return [np.nan, np.nan]
+    num_curr = len(curr_arr)
+    values, counts = np.unique(curr_arr, return_counts=True)
+    curr_cdf = np.cumsum(counts) / num_curr
+    # reference CDF above current ECDF, from left limits of both
+    stat_greater = np.max(
+        get_quantile_cdf(values, refer_quantiles, quantile_levels, "left")
+        - np.append(0, curr_cdf[:-1])
+    )
+    # current ECDF above reference CDF
+    stat_less = np.max(
+        curr_cdf
+        - get_quantile_cdf(values, refer_quantiles, quantile_levels, "right")
+    )
+    if alternative == "greater":
+        statistic = stat_greater
+    elif alternative == "less":
+        statistic = stat_less
+    else:
+        statistic = max(stat_greater, stat_less)
+    statistic = np.clip(statistic, 0, 1)
+    if alternative != "two-sided":
+        pvalue = stats.ksone.sf(statistic, num_curr)
+    elif method == "asymp":
+        pvalue = stats.kstwobign.sf(np.sqrt(num_curr) * statistic)
+    else:
+        pvalue = stats.kstwo.sf(statistic, num_curr)
+    return [statistic, np.clip(pvalue, 0, 1)]
+
+
+def detect_features_drift_from_profile(
+    curr_data: pd.DataFrame,
+    refer_profile: Dict,
+    numericals: List[str],
+    categoricals: List[str],
+    kst_threshold: float = 0.05,
+    kst_params: Dict[str, Union[str, int]] = dict(
+        method="exact", N=20, alternative="two-sided"
+    ),
+    wsd_threshold: float = 0.5,
+    jsd_threshold: float = 0.5,
+) -> List[pd.DataFrame]:
+    """Perform checks for drift in features, using reference data profile.
+
+    Same as detect_features_drift(), with the reference data replaced by
+    its profile (from get_reference_profile()), so current data can be
+    checked in batches without loading the reference data. Wasserstein
+    distances are approximated from quantiles of the reference and current
+    data. The Kolmogorov-Smirnov test is a one-sample test of current data
+    against the reference CDF, interpolated between reference quantiles
+    (see get_ks_test_from_quantiles()).
+    """
+    is_small_curr = len(curr_data) <= 1_000
+    df_cat_stats = pd.DataFrame()
+    if categoricals and not is_small_curr:
+        df_cat_stats = get_categorical_drift(
+            CategoryHistogram(categoricals).update(curr_data),
+            get_profile_histogram(refer_profile, categoricals),
+            jsd_threshold,
+        )
+
+    df_num_stats = pd.DataFrame()
+    if numericals:
+        num_profiles = [refer_profile["numericals"][c] for c in numericals]
+        quantile_levels = np.array(refer_profile["quantile_levels"])
+        refer_quantiles = np.array([p["quantiles"] for p in num_profiles]).T
+        refer_mean, refer_std = [
+            np.array([p[stat] for p in num_profiles])
+            for stat in ["mean", "std"]
+        ]
+        curr_arr = curr_data[numericals].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        curr_mean = np.nanmean(curr_arr, axis=0)
+        curr_std = np.nanstd(curr_arr, axis=0, ddof=1)
+        if is_small_curr:
+            metric_values = np.array(
+                [
+                    get_ks_test_from_quantiles(
+                        curr_arr[:, k],
+                        refer_quantiles[:, k],
+                        quantile_levels,
+                        kst_params.get("alternative", "two-sided"),
+                        kst_params.get("method", "exact"),
+                    )[1]
+                    for k in range(len(numericals))
+                ]
+            )
+            metric_threshold = kst_threshold
+        else:
+            curr_quantiles = np.nanquantile(curr_arr, quantile_levels, axis=0)
+            # area between quantile functions of reference and current data
+            # (trapezoidal rule)
+            quantile_diffs = np.abs(refer_quantiles - curr_quantiles)
+            metric_values = (quantile_diffs[:-1] + quantile_diffs[1:]).mean(
+                axis=0
+            ) / 2
+            metric_threshold = wsd_threshold
+        num_stats = {
+            "feature_type": "numerical",
+            "feature": numericals,
+            "nunique_ref": [p["nunique"] for p in num_profiles],
+            "nunique_curr": get_nunique_sorted(np.sort(curr_arr, axis=0)),
+            "pct_diff_mean": 100 * (refer_mean - curr_mean) / refer_mean,
+            "pct_diff_std": 100 * (refer_std - curr_std) / refer_std,
+            "abs_diff_mean": refer_mean - curr_mean,
+            "abs_diff_std": refer_std - curr_std,
+            "metric_value": metric_values,
+            "metric_threshold": metric_threshold,
+        }
+        # check if drift is present
+        if is_small_curr:
+            num_stats["reject_null"] = metric_values < metric_threshold
+            num_stats["drift_detected"] = num_stats["reject_null"]
+            num_stats["test_type"] = "Kolmogorov-Smirnov"
+            num_stats.update(kst_params)
+        else:
+            num_stats["drift_detected"] = metric_values > metric_threshold
+            num_stats["test_type"] = "Wasserstein"
+        df_num_stats = pd.DataFrame(num_stats)
+    return [df_num_stats, df_cat_stats]
+
+
+def save_reference_profile(refer_profile: Dict, fpath: str) -> str:
+    """Export profile of reference data to JSON file."""
+    os.makedirs(os.path.dirname(fpath) or ".", exist_ok=True)
+    with open(fpath, "w", encoding="utf-8") as f:
+        json.dump(refer_profile, f)
+    return fpath
+
+
+def load_reference_profile(fpath: str) -> Dict:
+    """Load profile of reference data from JSON file."""
+    with open(fpath, encoding="utf-8") as f:
+        refer_profile = json.load(f)
+    return refer_profile
+
+
+def log_reference_profile(
+    refer_profile: Dict, fpath: str, run_id: str
+) -> None:
+    """Export profile of reference data and track with MLFlow, as artifact."""
+    import mlflow
+
+    _ = save_reference_profile(refer_profile, fpath)
+    with mlflow.start_run(run_id=run_id) as _:
+        mlflow.log_artifact(fpath)
+    print(
+        "Logged reference data profile as artifact in file "
+        f"{os.path.basename(fpath)}"
+    )
+
+
+def get_stability_counts(df: pd.DataFrame) -> Dict[str, int]:
+    """Count missing, constant, duplicated and empty columns and rows.
+
+    Empty strings and infinite values are counted as missing, as in
+    evidently. Duplicated rows and columns are found from hashes of values.
+    """
+    is_null = np.zeros(df.shape, dtype=bool)
+    is_missing = np.zeros(df.shape, dtype=bool)
+    col_hashes = np.zeros((df.shape[1], df.shape[0]), dtype=np.uint64)
+    is_constant = np.zeros(df.shape[1], dtype=bool)
+    for k, c in enumerate(df):
+        s = df[c]
+        is_null[:, k] = s.isna().to_numpy()
+        if pd.api.types.is_numeric_dtype(s) and not isinstance(
+            s.dtype, pd.CategoricalDtype
+        ):
+            is_inf = np.isinf(s.to_numpy(dtype=np.float64, na_value=np.nan))
+            is_missing[:, k] = is_null[:, k] | is_inf
+        else:
+            is_missing[:, k] = is_null[:, k] | (s == "").to_numpy(
+                dtype=bool, na_value=False
+            )
+        is_constant[k] = s.nunique() <= 1
+        col_hashes[k] = pd.util.hash_pandas_object(s, index=False).to_numpy()
+    # row hashes combine hashes of values in every column
+    row_hashes = pd.util.hash_pandas_object(df, index=False)
+    num_unique_cols = len(np.unique(col_hashes, axis=0)) if len(df) else 1
+    stability_counts = {
+        "num_columns": df.shape[1],
+        "num_rows": df.shape[0],
+        "num_columns_with_missing_values": int(is_missing.any(axis=0).sum()),
+        "num_rows_with_missing_values": int(is_missing.any(axis=1).sum()),
+        "num_constant_columns": int(is_constant.sum()),
+        "num_duplicated_rows": int(row_hashes.duplicated().sum()),
+        "num_duplicated_columns": df.shape[1] - num_unique_cols,
+        "num_empty_columns": int(is_null.all(axis=0).sum()),
+        "num_empty_rows": int(is_null.all(axis=1).sum()),
+    }
+    return stability_counts
+
+
+def check_data_stability_native(
+    curr_data: pd.DataFrame, refer_data: pd.DataFrame
+) -> Dict[str, str]:
+    """Run data stability tests, with conditions of evidently's tests.
+
+    Counts that scale with size of data (rows with missing values,
+    duplicated rows and empty rows) are compared to reference counts scaled
+    to size of current data, with a tolerance of 10%. These tests give a
+    status of ERROR if the reference data is empty. Other tests give a
+    status of SUCCESS or FAIL.
+    """
+    curr_counts, refer_counts = [
+        get_stability_counts(df) for df in [curr_data, refer_data]
+    ]
+    # reference count scaled to size of current data
+    scale = len(curr_data) / len(refer_data) if len(refer_data) else np.nan
+
+    def is_approx(count: str) -> bool:
+        expected = refer_counts[count] * scale
+        return abs(curr_counts[count] - expected) <= max(0.1 * expected, 1e-12)
+
+    test_passed = {
+        "TestNumberOfColumnsWithMissingValues": (
+            curr_counts["num_columns_with_missing_values"]
+            <= refer_counts["num_columns_with_missing_values"]
+        ),
+        "TestNumberOfRowsWithMissingValues": (
+            curr_counts["num_rows_with_missing_values"]
+            <= 1.1 * refer_counts["num_rows_with_missing_values"] * scale
+        ),
+        "TestNumberOfConstantColumns": (
+            curr_counts["num_constant_columns"]
+            <= refer_counts["num_constant_columns"]
+        ),
+        "TestNumberOfDuplicatedRows": is_approx("num_duplicated_rows"),
+        "TestNumberOfDuplicatedColumns": (
+            curr_counts["num_duplicated_columns"]
+            <= refer_counts["num_duplicated_columns"]
+        ),
+        "TestNumberOfEmptyColumns": (
+            curr_counts["num_empty_columns"]
+            <= refer_counts["num_empty_columns"]
+        ),
+        "TestNumberOfEmptyRows": is_approx("num_empty_rows"),
+        "TestNumberOfColumns": (
+            curr_counts["num_columns"] == refer_counts["num_columns"]
+        ),
+    }
+    scaled_tests = [
+        "TestNumberOfRowsWithMissingValues",
+        "TestNumberOfDuplicatedRows",
+        "TestNumberOfEmptyRows",
+    ]
+    test_results = {
+        test: (
+            "ERROR"
+            if test in scaled_tests and np.isnan(scale)
+            else "SUCCESS"
+            if passed
+            else "FAIL"
+        )
+        for test, passed in test_passed.items()
+    }
+    return test_results
+
+
+def check_data_stability_evidently(
+    curr_data: pd.DataFrame, refer_data: pd.DataFrame
+) -> Dict:
+    """Run data stability tests using evidently TestSuite."""
+    import evidently.tests as eaits
+    from evidently.test_suite import TestSuite
+
     tests = TestSuite(
         tests=[
             eaits.TestNumberOfColumnsWithMissingValues(),
@@ -171,17 +941,56 @@ def check_data_stability(
             eaits.TestNumberOfColumns(),
         ]
     )
-    tests.run(
-        reference_data=refer_data[ts_cols_eai],
-        current_data=curr_data[ts_cols_eai],
-    )
+    tests.run(reference_data=refer_data, current_data=curr_data)
+    return tests.as_dict()["summary"]
+
+
+def check_data_stability(
+    curr_data: pd.DataFrame,
+    refer_data: pd.DataFrame,
+    numericals: List[str],
+    categoricals: List[str],
+    backend: str = "evidently",
+) -> pd.DataFrame:
+    """Check subset of features for data stability using reference dataset.
+
+    Tests are run with evidently (backend='evidently') or natively
+    (backend='native'), without needing evidently.
+    """
+    backends = ["native", "evidently"]
+    if backend not in backends:
+        raise ValueError(
+            f"Unsupported backend: {backend}. Use one of {backends}"
+        )
+    ts_cols_eai = categoricals + numericals
+    start_time = datetime.now(pytz.timezone("US/Eastern"))
+    start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S.%f")
+    print(f"Test suite start time = {start_time_str[:-3]}...", end="")
+    if backend == "evidently":
+        summary = check_data_stability_evidently(
+            curr_data[ts_cols_eai], refer_data[ts_cols_eai]
+        )
+    else:
+        test_results = check_data_stability_native(
+            curr_data[ts_cols_eai], refer_data[ts_cols_eai]
+        )
+        # same summary as evidently, with only statuses that were found
+        by_status = dict(Counter(test_results.values()))
+        num_passed = by_status.get("SUCCESS", 0)
+        summary = {
+            "all_passed": num_passed == len(test_results),
+            "total_tests": len(test_results),
+            "success_tests": num_passed,
+            "failed_tests": by_status.get("FAIL", 0),
+            "by_status": by_status,
+        }
     end_time = datetime.now(pytz.timezone("US/Eastern"))
     end_time_str = end_time.strftime("%Y-%m-%d %H:%M:%S.%f")
     duration = end_time - start_time
     duration = duration.seconds + (duration.microseconds / 1_000_000)
     print(f"done at {end_time_str[:-3]} ({duration:.3f} seconds).")
     df_stability = (
-        pd.DataFrame.from_dict(tests.as_dict()["summary"], orient="index")
+        pd.DataFrame.from_dict(summary, orient="index")
         .transpose()
         .assign(len_curr_data=len(curr_data))
         .assign(len_ref_data=len(refer_data))
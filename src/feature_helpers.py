@@ -8,6 +8,8 @@
 # pylint: disable=too-many-locals,unused-argument
 # pylint: disable=missing-class-docstring
 
+import numpy as np
+import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
 
@@ -22,14 +24,41 @@ class AboveAveragePagePromoEngager(BaseEstimator, TransformerMixin):
 
     def fit(self, X, y=None):
         """Train."""
+        # averages are learned from training data, so features of a batch
+        # of data do not depend on the other observations in that batch
+        self.means_ = X[self.cols].mean().to_numpy(dtype=np.float64)
+        cols_new = [f"above_avg_{c}" for c in self.cols]
+        self.columns_trans = list(X.columns) + [
+            c for c in cols_new if c not in list(X.columns)
+        ]
         return self
 
     def transform(self, X):
         "Transform."
-        for c in self.cols:
-            f = f"above_avg_{c}"
-            X[f] = 0 if X[c].mean() == 0 else X[c] / X[c].mean()
-        self.columns_trans = X.columns.tolist()
+        values = X[self.cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        # estimators persisted before averages were learned use averages of
+        # the data being transformed
+        means = getattr(self, "means_", None)
+        if means is None:
+            means = np.nanmean(values, axis=0)
+        ratios = np.divide(
+            values,
+            means,
+            out=np.zeros_like(values),
+            where=means != 0,
+        )
+        # create new DataFrame, instead of changing input data, with ratios
+        # of nullable features kept as nullable floats
+        X = X.assign(
+            **{
+                f"above_avg_{c}": (
+                    pd.array(ratios[:, k], dtype=pd.Float64Dtype())
+                    if pd.api.types.is_extension_array_dtype(X[c].dtype)
+                    else ratios[:, k]
+                )
+                for k, c in enumerate(self.cols)
+            }
+        )
         return X
 
     def get_feature_names_out(self):
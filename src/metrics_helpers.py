@@ -7,10 +7,14 @@
 # pylint: disable=invalid-name,dangerous-default-value,too-many-arguments
 # pylint: disable=too-many-locals,unused-argument,redefined-outer-name
 
+import time
+import warnings
 from typing import Dict, List, Union
 
+import numpy as np
 import pandas as pd
 import sklearn.metrics as skm
+from sklearn.exceptions import UndefinedMetricWarning
 
 
 def pr_auc_score(y_true, y_score, sample_weight=None):
@@ -22,6 +26,86 @@ def pr_auc_score(y_true, y_score, sample_weight=None):
     return pr_auc
 
 
+def get_confusion_count_scores(
+    c: Dict[str, np.ndarray],
+    average: str = "macro",
+    zero_division: str = "warn",
+    precision_average: str = "binary",
+) -> Dict[str, np.ndarray]:
+    """Get scores from binary confusion matrix counts.
+
+    Counts (tp, fp, fn, tn) are arrays, eg. with one element per
+    discrimination threshold, and w_tp, w_fp, w_fn, w_tn are the same
+    counts weighted by sample weights. Accuracy and balanced accuracy are
+    unweighted and, by default, precision is for the positive class only,
+    as in get_metrics().
+    """
+    if {average, precision_average} - {"macro", "binary"}:
+        raise ValueError(
+            f"Unsupported average: {average} or {precision_average}. "
+            "Use 'macro' or 'binary'"
+        )
+    zero_div_value = 0.0 if zero_division == "warn" else float(zero_division)
+
+    def safe_divide(num: np.ndarray, denom: np.ndarray, metric: str):
+        is_undefined = denom == 0
+        if zero_division == "warn" and is_undefined.any():
+            warnings.warn(
+                f"{metric.title()} is ill-defined and being set to 0.0 in "
+                f"{is_undefined.sum()} of {is_undefined.size} cases.",
+                UndefinedMetricWarning,
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(is_undefined, zero_div_value, num / denom)
+
+    def get_fbeta(tp, fp, fn, beta):
+        beta2 = beta**2
+        num = (1 + beta2) * tp
+        return safe_divide(num, num + beta2 * fn + fp, "f-score")
+
+    n = c["tp"] + c["fp"] + c["fn"] + c["tn"]
+    tpr = c["tp"] / (c["tp"] + c["fn"])
+    tnr = c["tn"] / (c["tn"] + c["fp"])
+    # (weighted) counts for the negative class are the positive class counts
+    # with positives and negatives swapped
+    w_pos = [c["w_tp"], c["w_fp"], c["w_fn"]]
+    w_neg = [c["w_tn"], c["w_fn"], c["w_fp"]]
+    w_tpr = c["w_tp"] / (c["w_tp"] + c["w_fn"])
+    w_fpr = c["w_fp"] / (c["w_fp"] + c["w_tn"])
+    w_tnr = 1 - w_fpr
+    w_precision = safe_divide(c["w_tp"], c["w_tp"] + c["w_fp"], "precision")
+    w_prevalence = (c["w_tp"] + c["w_fn"]) / (
+        c["w_tp"] + c["w_fn"] + c["w_fp"] + c["w_tn"]
+    )
+
+    def average_classes(metric_pos, metric_neg, average=average):
+        if average == "binary":
+            return metric_pos
+        return (metric_pos + metric_neg) / 2
+
+    scores_dict = {
+        "accuracy": (c["tp"] + c["tn"]) / n,
+        "balanced_accuracy": (tpr + tnr) / 2,
+        "precision": average_classes(
+            w_precision,
+            safe_divide(c["w_tn"], c["w_tn"] + c["w_fn"], "precision"),
+            precision_average,
+        ),
+        "recall": average_classes(w_tpr, w_tnr),
+        # ROC curve of binary predictions has a single point (FPR, TPR)
+        "roc_auc": (1 + w_tpr - w_fpr) / 2,
+        "f1": average_classes(get_fbeta(*w_pos, 1), get_fbeta(*w_neg, 1)),
+        "fbeta05": average_classes(
+            get_fbeta(*w_pos, 0.5), get_fbeta(*w_neg, 0.5)
+        ),
+        "fbeta2": average_classes(get_fbeta(*w_pos, 2), get_fbeta(*w_neg, 2)),
+        # precision-recall curve of binary predictions has a single point
+        # before the point where all observations are predicted positive
+        "avg_precision": w_tpr * w_precision + (1 - w_tpr) * w_prevalence,
+    }
+    return scores_dict
+
+
 def get_scorers(
     average: str = "macro", zero_division: str = "warn", sample_weight=None
 ) -> Dict:
@@ -76,6 +160,46 @@ def get_scorers(
     return scorers_dict
 
 
+class FusedScorer:
+    """Score an estimator on all metrics of get_scorers(), at once.
+
+    Predicted labels and probabilities are calculated once per call and all
+    scores of predicted labels are calculated from a single confusion
+    matrix. Use as the scoring argument of GridSearchCV.
+    """
+
+    def __init__(
+        self,
+        average: str = "macro",
+        zero_division: str = "warn",
+        sample_weight=None,
+    ):
+        """
+        Initializes FusedScorer.
+
+        Args:
+            Same as get_scorers().
+        """
+        self.average = average
+        self.zero_division = zero_division
+        self.sample_weight = sample_weight
+
+    def __call__(self, estimator, X, y_true) -> Dict[str, float]:
+        """Get dictionary of scores for predictions of estimator on X."""
+        y_pred = estimator.predict(X)
+        y_pred_proba = estimator.predict_proba(X)[:, 1]
+        counts = get_confusion_counts(y_true, y_pred, self.sample_weight)
+        # as in get_scorers(), precision is averaged over classes
+        scores = get_confusion_count_scores(
+            counts, self.average, self.zero_division, self.average
+        )
+        scores_dict = {k: float(v[0]) for k, v in scores.items()}
+        scores_dict["pr_auc"] = pr_auc_score(y_true, y_pred_proba)
+        # use same order of scores as get_scorers()
+        scores_dict["avg_precision"] = scores_dict.pop("avg_precision")
+        return scores_dict
+
+
 def get_metrics(
     y_true: pd.Series,
     y_pred: pd.Series,
@@ -83,8 +207,19 @@ def get_metrics(
     average: str = "macro",
     zero_division: str = "warn",
     sample_weight=None,
+    use_confusion_matrix: bool = True,
 ) -> Dict:
     """Get dictionary of scorers."""
+    if use_confusion_matrix:
+        metrics_dict = get_metrics_bundle(
+            y_true,
+            y_pred,
+            y_pred_proba,
+            average,
+            zero_division,
+            sample_weight,
+        )
+        return metrics_dict
     metrics_dict = {
         "accuracy": skm.accuracy_score(y_true, y_pred),
         "balanced_accuracy": skm.balanced_accuracy_score(y_true, y_pred),
@@ -143,6 +278,95 @@ def get_metrics(
     return metrics_dict
 
 
+def get_confusion_counts(
+    y_true: pd.Series, y_pred: pd.Series, sample_weight=None
+) -> Dict[str, np.ndarray]:
+    """Get unweighted and weighted binary confusion matrix counts."""
+    y_true = np.asarray(y_true, dtype=np.int64).squeeze()
+    y_pred = np.asarray(y_pred, dtype=np.int64).squeeze()
+    if not np.isin(y_true, [0, 1]).all() or not np.isin(y_pred, [0, 1]).all():
+        raise ValueError("Labels must be binary, with values of 0 or 1")
+    # encode (true, predicted) pairs as 0=tn, 1=fp, 2=fn, 3=tp
+    cells = 2 * y_true + y_pred
+    cm = np.bincount(cells, minlength=4).astype(np.float64)
+    w_cm = (
+        cm
+        if sample_weight is None
+        else np.bincount(cells, weights=np.asarray(sample_weight), minlength=4)
+    )
+    counts = {}
+    for prefix, cm_values in [("", cm), ("w_", w_cm)]:
+        counts.update(
+            {
+                f"{prefix}{cell}": cm_values[[k]]
+                for k, cell in enumerate(["tn", "fp", "fn", "tp"])
+            }
+        )
+    return counts
+
+
+def get_metrics_bundle(
+    y_true: pd.Series,
+    y_pred: pd.Series,
+    y_pred_proba: pd.Series,
+    average: str = "macro",
+    zero_division: str = "warn",
+    sample_weight=None,
+) -> Dict:
+    """Get same dictionary of scores as get_metrics(), from shared counts.
+
+    Labels are encoded and the confusion matrix is built once. All scores
+    of predicted labels are calculated from the confusion matrix and the
+    PR curve of predicted probabilities is calculated once.
+    """
+    counts = get_confusion_counts(y_true, y_pred, sample_weight)
+    scores = get_confusion_count_scores(counts, average, zero_division)
+    metrics_dict = {k: float(v[0]) for k, v in scores.items()}
+    metrics_dict["pr_auc"] = pr_auc_score(
+        y_true, y_pred_proba, sample_weight=sample_weight
+    )
+    # use same order of scores as get_metrics()
+    metrics_dict["avg_precision"] = metrics_dict.pop("avg_precision")
+    return metrics_dict
+
+
+def benchmark_metrics(
+    y_true: pd.Series,
+    y_pred: pd.Series,
+    y_pred_proba: pd.Series,
+    num_repeats: int = 5,
+    **kwargs,
+) -> pd.DataFrame:
+    """Compare run time of metrics bundle to separate sklearn metrics."""
+    records = []
+    for k in range(num_repeats):
+        for approach, use_cm in [
+            ("sklearn_metrics", False),
+            ("metrics_bundle", True),
+        ]:
+            start_time = time.perf_counter()
+            _ = get_metrics(
+                y_true,
+                y_pred,
+                y_pred_proba,
+                use_confusion_matrix=use_cm,
+                **kwargs,
+            )
+            records.append(
+                {
+                    "approach": approach,
+                    "repeat": k,
+                    "duration_seconds": time.perf_counter() - start_time,
+                }
+            )
+    df_benchmark = (
+        pd.DataFrame.from_records(records)
+        .groupby("approach", as_index=False)["duration_seconds"]
+        .agg(["min", "median", "max"])
+    )
+    return df_benchmark
+
+
 def calculate_metrics(
     y_train: pd.Series,
     y_train_pred: pd.Series,
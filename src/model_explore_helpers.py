@@ -49,15 +49,11 @@ def get_preprocessed_resampled_data(
         _ = pipe_trans.fit(X_train, y_train)
 
         # pre-process training and test data
-        feats_trans, trans_dtypes = prh.get_transformed_features(
+        _ = prh.fit_output_schema(
             pipe_trans, "aboveavg", "select", categorical_features
         )
-        X_train_trans = prh.transform_data(
-            X_train, trans_dtypes, feats_trans, pipe_trans
-        )
-        X_test_trans = prh.transform_data(
-            X_test, trans_dtypes, feats_trans, pipe_trans
-        )
+        X_train_trans = prh.transform_data_with_schema(X_train, pipe_trans)
+        X_test_trans = prh.transform_data_with_schema(X_test, pipe_trans)
 
         # over-sample pre-processed training data
         X_train_trans_rs, y_train_trans_rs = pipe_resample.fit_resample(
@@ -75,13 +71,13 @@ def get_preprocessed_resampled_data(
         _ = pipe_resample_trans.fit(X_train, y_train)
 
         # pre-process under-sampled training and raw test data
-        feats_trans, trans_dtypes = prh.get_transformed_features(
+        _ = prh.fit_output_schema(
             pipe_resample_trans, "aboveavg", "select", categorical_features
         )
-        X_train_trans = prh.transform_data(
-            X_train, trans_dtypes, feats_trans, pipe_resample_trans
+        X_train_trans = prh.transform_data_with_schema(
+            X_train, pipe_resample_trans
         )
-        X_test_trans = prh.transform_data(
-            X_test, trans_dtypes, feats_trans, pipe_resample_trans
+        X_test_trans = prh.transform_data_with_schema(
+            X_test, pipe_resample_trans
         )
         return [X_train_trans, X_test_trans]
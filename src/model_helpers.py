@@ -9,14 +9,23 @@
 
 import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from glob import glob
-from typing import List, Union
+from typing import Dict, Iterator, List, Union
 
 import mlflow.sklearn
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from mlflow import MlflowClient
 from sklearn.pipeline import Pipeline
 
+# model used by inference worker processes
+INFERENCE_WORKER_STATE: Dict = {}
+
 
 def get_all_deployment_candidate_models() -> pd.DataFrame:
     """Get all MLFlow deployment candidate models from model registry."""
@@ -157,18 +166,148 @@ def check_data_per_best_expt_run(
     assert data_end_date == best_test_end_date
 
 
+def get_model_threshold(model: Pipeline) -> float:
+    """Get discrimination threshold used by (final step of) model."""
+    estimator = model[-1] if isinstance(model, Pipeline) else model
+    threshold = getattr(estimator, "threshold", 0.5)
+    return threshold
+
+
 def make_inference(
-    model: Pipeline, X: pd.DataFrame, y_pred_name: str
+    model: Pipeline,
+    X: pd.DataFrame,
+    y_pred_name: str,
+    derive_labels: bool = True,
 ) -> List[pd.Series]:
-    """Make inference predictions using trained model."""
-    y_pred_arr = model.predict(X)
+    """Make inference predictions using trained model.
+
+    By default, data is passed through the model's pipeline once and
+    predicted labels are derived from predicted probabilities using the
+    model's threshold.
+    """
+    if derive_labels:
+        y_pred_proba_arr = model.predict_proba(X)[:, 1]
+        y_pred_arr = (y_pred_proba_arr > get_model_threshold(model)).astype(
+            int
+        )
+    else:
+        y_pred_arr = model.predict(X)
+        y_pred_proba_arr = model.predict_proba(X)[:, 1]
     y_pred = pd.Series(
         y_pred_arr, index=X.index, dtype=pd.Int64Dtype(), name=y_pred_name
     )
     y_pred_proba = pd.Series(
-        model.predict_proba(X)[:, 1],
+        y_pred_proba_arr,
         index=X.index,
         dtype=pd.Float64Dtype(),
         name=y_pred_name,
     )
     return [y_pred, y_pred_proba]
+
+
+def score_batch(
+    model: Pipeline, df: pd.DataFrame, id_cols: List[str] = []
+) -> pd.DataFrame:
+    """Get predicted scores and labels for a batch of inference data.
+
+    Identifier columns are not passed to the model.
+    """
+    y_pred_proba = model.predict_proba(df.drop(columns=id_cols))[:, 1]
+    df_scores = df[id_cols].assign(
+        score=y_pred_proba,
+        predicted_score_label=(
+            y_pred_proba > get_model_threshold(model)
+        ).astype(np.int8),
+    )
+    return df_scores
+
+
+def init_inference_worker(model: Pipeline) -> None:
+    """Store model in worker process, so it is not sent with every batch."""
+    INFERENCE_WORKER_STATE["model"] = model
+
+
+def score_batch_in_worker(
+    df: pd.DataFrame, id_cols: List[str] = []
+) -> pd.DataFrame:
+    """Get predicted scores and labels, using model stored in worker."""
+    df_scores = score_batch(INFERENCE_WORKER_STATE["model"], df, id_cols)
+    return df_scores
+
+
+def make_chunked_inference(
+    model: Pipeline,
+    data_fpath: str,
+    scores_fpath: str,
+    id_cols: List[str] = ["fullvisitorid"],
+    columns: Union[List[str], None] = None,
+    batch_size: int = 100_000,
+    executor_type: str = "",
+    max_workers: Union[int, None] = None,
+) -> str:
+    """Score inference data in chunks, streamed from and to parquet files.
+
+    Each chunk of data is passed through the model's pipeline once and
+    scores are written to disk as soon as they are available, so the full
+    inference data is never loaded into memory. With executor_type of
+    'thread' or 'process', chunks are scored in parallel, with at most two
+    chunks per worker held in memory.
+    """
+    pf = pq.ParquetFile(data_fpath)
+    batches = (
+        rb.to_pandas()
+        for rb in pf.iter_batches(batch_size=batch_size, columns=columns)
+    )
+    os.makedirs(os.path.dirname(scores_fpath) or ".", exist_ok=True)
+    writer = None
+    try:
+        for df_scores in get_batch_scores(
+            model, batches, id_cols, executor_type, max_workers
+        ):
+            table = pa.Table.from_pandas(df_scores, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(scores_fpath, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return scores_fpath
+
+
+def get_batch_scores(
+    model: Pipeline,
+    batches: Iterator[pd.DataFrame],
+    id_cols: List[str] = [],
+    executor_type: str = "",
+    max_workers: Union[int, None] = None,
+) -> Iterator[pd.DataFrame]:
+    """Score batches of inference data in order, optionally in parallel."""
+    if not executor_type:
+        for df in batches:
+            yield score_batch(model, df, id_cols)
+        return
+    max_workers = max_workers or os.cpu_count() or 1
+    if executor_type == "thread":
+        ex = ThreadPoolExecutor(max_workers=max_workers)
+        score_func = partial(score_batch, model)
+    elif executor_type == "process":
+        ex = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=init_inference_worker,
+            initargs=(model,),
+        )
+        score_func = score_batch_in_worker
+    else:
+        raise ValueError(
+            f"Unsupported executor type: {executor_type}. "
+            "Use one of ['thread', 'process']"
+        )
+    with ex:
+        # limit number of batches held in memory
+        pending = deque()
+        for df in batches:
+            pending.append(ex.submit(score_func, df, id_cols))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -7,6 +7,8 @@
 # pylint: disable=invalid-name,dangerous-default-value
 # pylint: disable=too-many-locals,unused-argument,too-many-arguments
 
+import json
+import os
 from typing import Dict, List, Union
 
 import pandas as pd
@@ -37,62 +39,14 @@ def preprocess_data(
     # train feature preprocessor
     _ = pipe_trans.fit(X_train)
 
-    # extract numerical and categorical feature names in trained preprocessor
-    # - identical to get_transformed_features()
-    numericals_processed = (
-        pipe_trans.named_steps["preprocessor"]
-        .named_transformers_["num"]
-        .named_steps["aboveavg"]
-        .get_feature_names_out()
-    )
-    rarecats_bucket_features_out = [
-        c.split("__")[-1] for c in categorical_features
-    ]
-    categoricals_processed = (
-        pipe_trans.named_steps["preprocessor"]
-        .named_transformers_["cat"]
-        .named_steps["dummy"]
-        .get_feature_names_out(rarecats_bucket_features_out)
-        .tolist()
+    # get (cached) names and datatypes of features in trained preprocessor
+    _ = fit_output_schema(
+        pipe_trans, "aboveavg", "select", categorical_features
     )
-    categoricals_processed = [
-        c.replace(f"{cat_col}_", f"{cat_col}__")
-        for c in categoricals_processed
-        for cat_col in categorical_features
-        if c.startswith(cat_col)
-    ]
 
-    # extract numerical and categorical feature names in selected features
-    feats_selected = pipe_trans.named_steps["select"].get_feature_names_out(
-        numericals_processed + categoricals_processed
-    )
-    cats_selected = [c for c in categoricals_processed if c in feats_selected]
-    nums_selected = [c for c in numericals_processed if c in feats_selected]
-
-    # get feature datatypes in selected features
-    processed_dtypes = dict(
-        zip(
-            feats_selected,
-            # [pd.Float32Dtype() for _ in nums_selected]
-            # + [pd.Int8Dtype() for _ in cats_selected],
-            [pd.Float64Dtype() for _ in nums_selected]
-            + [pd.Int64Dtype() for _ in cats_selected],
-        )
-    )
-
-    # preprocess training data
-    # - identical to transform_data()
-    X_train_preprocessed = pipe_trans.transform(X_train)
-    X_train_preprocessed = X_train_preprocessed.rename(
-        columns=dict(zip(list(X_train_preprocessed), feats_selected))
-    ).astype(processed_dtypes)
-
-    # preprocess unseen (validation or test) data
-    # - identical to transform_data()
-    X_val_preprocessed = pipe_trans.transform(X_val)
-    X_val_preprocessed = X_val_preprocessed.rename(
-        columns=dict(zip(list(X_val_preprocessed), feats_selected))
-    ).astype(processed_dtypes)
+    # preprocess training and unseen (validation or test) data
+    X_train_preprocessed = transform_data_with_schema(X_train, pipe_trans)
+    X_val_preprocessed = transform_data_with_schema(X_val, pipe_trans)
 
     # perform oversampling
     if list(pipe_resample.named_steps)[0] == "os":
@@ -161,3 +115,94 @@ def transform_data(
     feats_trans = dict(zip(list(X_trans), features))
     X_trans = X_trans.rename(columns=feats_trans).astype(dtypes_dict)
     return X_trans
+
+
+def fit_output_schema(
+    pipe: Pipeline,
+    num_last_step: str,
+    pipe_last_step: str,
+    categorical_features: List[str],
+) -> Dict[str, List[str]]:
+    """Cache names and datatypes of features in trained pipeline.
+
+    Call after (re-)training the pipeline. The schema is stored in the
+    pipeline, as output_schema_, so it is persisted with the pipeline.
+    """
+    feats_selected, processed_dtypes = get_transformed_features(
+        pipe, num_last_step, pipe_last_step, categorical_features
+    )
+    feats_selected = list(feats_selected)
+    output_schema = {
+        "features": feats_selected,
+        "dtypes": [str(processed_dtypes[f]) for f in feats_selected],
+    }
+    pipe.output_schema_ = output_schema
+    return output_schema
+
+
+def transform_data_with_schema(
+    X: pd.DataFrame,
+    pipe: Pipeline,
+    output_schema: Union[Dict, None] = None,
+) -> pd.DataFrame:
+    """Transform data and create typed DataFrame from cached output schema.
+
+    Same as transform_data(), with output created once from the columns
+    of the transformed data, instead of renaming and changing datatypes.
+    """
+    output_schema = output_schema or pipe.output_schema_
+    X_trans = pipe.transform(X)
+    if isinstance(X_trans, pd.DataFrame):
+        index = X_trans.index
+        X_trans = [
+            X_trans.iloc[:, k].to_numpy() for k in range(X_trans.shape[1])
+        ]
+    else:
+        index = X.index
+        X_trans = list(X_trans.T)
+    X_trans = pd.DataFrame(
+        {
+            f: pd.array(X_trans[k], dtype=pd.api.types.pandas_dtype(d))
+            for k, (f, d) in enumerate(
+                zip(output_schema["features"], output_schema["dtypes"])
+            )
+        },
+        index=index,
+        copy=False,
+    )
+    return X_trans
+
+
+def save_output_schema(output_schema: Dict, fpath: str) -> str:
+    """Export output schema of trained pipeline to JSON file."""
+    os.makedirs(os.path.dirname(fpath) or ".", exist_ok=True)
+    with open(fpath, "w", encoding="utf-8") as f:
+        json.dump(output_schema, f, indent=2)
+    return fpath
+
+
+def load_output_schema(fpath: str) -> Dict:
+    """Load output schema of trained pipeline from JSON file."""
+    with open(fpath, encoding="utf-8") as f:
+        output_schema = json.load(f)
+    return output_schema
+
+
+def log_output_schema(output_schema: Dict, fpath: str, run_id: str) -> None:
+    """Export output schema and track with MLFlow model, as an artifact.
+
+    The artifact is logged to the active run, if it is the given run, so
+    this can be called while the model is logged.
+    """
+    import mlflow
+
+    _ = save_output_schema(output_schema, fpath)
+    active_run = mlflow.active_run()
+    if active_run and active_run.info.run_id == run_id:
+        mlflow.log_artifact(fpath)
+    else:
+        with mlflow.start_run(run_id=run_id) as _:
+            mlflow.log_artifact(fpath)
+    print(
+        f"Logged output schema as artifact in file {os.path.basename(fpath)}"
+    )
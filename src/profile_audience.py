@@ -9,14 +9,23 @@
 
 
 from functools import reduce
+from typing import List
 
+import numpy as np
 import pandas as pd
 
 import audience_size_helpers as ash
 
 
-def get_profile_proportions(df: pd.DataFrame) -> pd.DataFrame:
-    """Get visitor fraction for subset of features per audience group."""
+def get_profile_proportions(
+    df: pd.DataFrame, vectorized: bool = True
+) -> pd.DataFrame:
+    """Get visitor fraction for subset of features per audience group.
+
+    With vectorized, every condition is evaluated once over all visitors
+    and fractions for all conditions and audience groups are found with a
+    single groupby, instead of querying each audience group per condition.
+    """
     df = df.astype(
         {
             "last_action": pd.StringDtype(),
@@ -64,18 +73,33 @@ def get_profile_proportions(df: pd.DataFrame) -> pd.DataFrame:
             "bounce_rate",
         ],
     ]
-    dfs_proportion_by_aud = [
-        df.groupby("maudience", as_index=False)
-        .apply(lambda df: 100 * len(df.query(query_str)) / len(df))
-        .rename(columns={None: condition})
-        for query_str, condition in zip(queries, conditions)
-    ]
-    df_proportion_by_aud = (
-        reduce(
+    if vectorized:
+        # matrix of conditions, with missing values not meeting a condition
+        df_conditions = pd.DataFrame(
+            {
+                condition: df.eval(query_str)
+                .astype(pd.BooleanDtype())
+                .fillna(False)
+                .astype(bool)
+                for query_str, condition in zip(queries, conditions)
+            }
+        ).assign(maudience=df["maudience"])
+        df_proportion_by_aud = (
+            100 * df_conditions.groupby("maudience").mean()
+        ).reset_index()
+    else:
+        dfs_proportion_by_aud = [
+            df.groupby("maudience", as_index=False)
+            .apply(lambda df: 100 * len(df.query(query_str)) / len(df))
+            .rename(columns={None: condition})
+            for query_str, condition in zip(queries, conditions)
+        ]
+        df_proportion_by_aud = reduce(
             lambda df1, df2: pd.merge(df1, df2, on="maudience"),
             dfs_proportion_by_aud,
         )
-        .set_index("maudience")
+    df_proportion_by_aud = (
+        df_proportion_by_aud.set_index("maudience")
         .transpose()
         .reset_index()
         .rename(columns={"index": "stat"})
@@ -85,44 +109,98 @@ def get_profile_proportions(df: pd.DataFrame) -> pd.DataFrame:
     return df_proportion_by_aud
 
 
-def get_descriptive_stats(df: pd.DataFrame) -> pd.DataFrame:
-    """Get descriptive stats for subset of features per audience group."""
-    df_profile_stats = (
-        df.astype(
-            {
-                "hits": pd.Int64Dtype(),
-                "promos_displayed": pd.Int64Dtype(),
-                "promos_clicked": pd.Int64Dtype(),
-                "product_views": pd.Int64Dtype(),
-                "product_clicks": pd.Int64Dtype(),
-                "pageviews": pd.Int64Dtype(),
-                "revenue": pd.Int64Dtype(),
-                "added_to_cart": pd.Int64Dtype(),
-            }
-        )
-        .groupby("maudience", as_index=False)
-        .agg(
-            {
-                "hour": ["mean"],
-                "day_of_week": ["mean"],
-                "source": [pd.Series.mode],
-                "medium": [pd.Series.mode],
-                "channelGrouping": [pd.Series.mode],
-                "last_action": [pd.Series.mode],
-                "browser": [pd.Series.mode],
-                "os": [pd.Series.mode],
-                "deviceCategory": [pd.Series.mode],
-                "hits": ["mean", "max"],  #
-                "promos_displayed": ["mean", "max"],
-                "promos_clicked": ["mean", "max"],
-                "product_views": ["mean", "max"],
-                "product_clicks": ["mean", "max"],  #
-                "pageviews": ["mean", "max"],  #
-                "revenue": ["mean", "max"],
-                "added_to_cart": ["mean", "max"],
-            }
-        )
+def get_group_modes(
+    df: pd.DataFrame, by: str, columns: List[str]
+) -> pd.DataFrame:
+    """Get most frequent value of columns per group, from counts of codes.
+
+    Same as aggregating with pd.Series.mode, except ties are broken by
+    taking the smallest value, and groups with no values get a missing
+    value, instead of a list of values.
+    """
+    group_codes, groups = pd.factorize(df[by], sort=True)
+    has_group = group_codes >= 0
+    modes = {}
+    for c in columns:
+        codes, uniques = pd.factorize(df[c])
+        is_valid = has_group & (codes >= 0)
+        # counts of every value in every group, with values in sorted order
+        value_order = np.argsort(uniques, kind="stable")
+        uniques = uniques.take(value_order)
+        counts = np.bincount(
+            group_codes[is_valid] * len(uniques) + codes[is_valid],
+            minlength=len(groups) * len(uniques),
+        ).reshape(len(groups), len(uniques))[:, value_order]
+        # first most frequent value is the smallest one
+        mode_codes = counts.argmax(axis=1) if len(uniques) else []
+        modes[c] = [
+            uniques[k] if n else pd.NA
+            for k, n in zip(mode_codes, counts.sum(axis=1))
+        ]
+    df_modes = pd.DataFrame(modes, index=pd.Index(groups, name=by))
+    return df_modes
+
+
+def get_descriptive_stats(
+    df: pd.DataFrame, vectorized: bool = True
+) -> pd.DataFrame:
+    """Get descriptive stats for subset of features per audience group.
+
+    With vectorized, most frequent values (modes) of categorical features
+    are found for all audience groups at once, from counts of values.
+    """
+    categoricals = [
+        "source",
+        "medium",
+        "channelGrouping",
+        "last_action",
+        "browser",
+        "os",
+        "deviceCategory",
+    ]
+    stats = {
+        "hour": ["mean"],
+        "day_of_week": ["mean"],
+        **{c: [pd.Series.mode] for c in categoricals},
+        "hits": ["mean", "max"],  #
+        "promos_displayed": ["mean", "max"],
+        "promos_clicked": ["mean", "max"],
+        "product_views": ["mean", "max"],
+        "product_clicks": ["mean", "max"],  #
+        "pageviews": ["mean", "max"],  #
+        "revenue": ["mean", "max"],
+        "added_to_cart": ["mean", "max"],
+    }
+    df = df.astype(
+        {
+            "hits": pd.Int64Dtype(),
+            "promos_displayed": pd.Int64Dtype(),
+            "promos_clicked": pd.Int64Dtype(),
+            "product_views": pd.Int64Dtype(),
+            "product_clicks": pd.Int64Dtype(),
+            "pageviews": pd.Int64Dtype(),
+            "revenue": pd.Int64Dtype(),
+            "added_to_cart": pd.Int64Dtype(),
+        }
     )
+    if vectorized:
+        df_profile_stats = df.groupby("maudience", as_index=False).agg(
+            {c: v for c, v in stats.items() if c not in categoricals}
+        )
+        df_modes = get_group_modes(df, "maudience", categoricals)
+        for c in categoricals:
+            df_profile_stats[(c, "mode")] = df_modes[c].to_numpy()
+        # order stats as when aggregating modes with other stats
+        df_profile_stats = df_profile_stats[
+            [("maudience", "")]
+            + [
+                (c, getattr(f, "__name__", f))
+                for c, v in stats.items()
+                for f in v
+            ]
+        ]
+    else:
+        df_profile_stats = df.groupby("maudience", as_index=False).agg(stats)
     df_profile_stats.columns = [
         "__".join(column).rstrip("__")
         for column in df_profile_stats.columns.to_flat_index()
@@ -9,6 +9,8 @@
 # pylint: disable=too-many-instance-attributes
 
 
+from typing import Dict
+
 import numpy as np
 import pandas as pd
 import sklearn.metrics as skm
@@ -16,6 +18,8 @@ import sklearn.utils.validation as skc
 from sklearn.base import BaseEstimator, ClassifierMixin
 from sklearn.utils.multiclass import unique_labels
 
+import metrics_helpers as mh
+
 
 class BetaDistClassifier(BaseEstimator, ClassifierMixin):
     """Make predictions based on a continuous beta probability distribution."""
@@ -140,8 +144,19 @@ def get_threshold_tuning_scores(
     average: str = "macro",
     zero_division: str = "warn",
     sample_weight=None,
+    use_cumulative_counts: bool = True,
 ) -> pd.DataFrame:
     """Get scores from varying discrimination threshold."""
+    if use_cumulative_counts:
+        df_thresholds = get_threshold_sweep_scores(
+            y_true,
+            y_pred_proba,
+            thresholds,
+            average,
+            zero_division,
+            sample_weight,
+        )
+        return df_thresholds
     scores_thresholds = [
         {
             "t": t,
@@ -207,3 +222,72 @@ def get_threshold_tuning_scores(
     ]
     df_thresholds = pd.DataFrame.from_records(scores_thresholds)
     return df_thresholds
+
+
+def get_threshold_confusion_counts(
+    y_true: pd.Series,
+    y_pred_proba: pd.Series,
+    thresholds: np.ndarray = np.arange(0, 1, 0.01),
+    sample_weight=None,
+) -> Dict[str, np.ndarray]:
+    """Get confusion matrix counts for every discrimination threshold.
+
+    Scores are sorted once and (weighted) counts of true positives and
+    false positives at each threshold are read from cumulative sums.
+    """
+    y = np.asarray(y_true, dtype=np.float64).squeeze()
+    scores = np.asarray(y_pred_proba, dtype=np.float64).squeeze()
+    weights = (
+        np.ones_like(y)
+        if sample_weight is None
+        else np.asarray(sample_weight, dtype=np.float64)
+    )
+    sort_order = np.argsort(scores, kind="stable")
+    scores = scores[sort_order]
+    y = y[sort_order]
+    weights = weights[sort_order]
+    # first position with a score >= threshold, for every threshold, so that
+    # all positions from there onwards are predicted to be positive
+    first_pos_pred = np.searchsorted(scores, thresholds, side="left")
+
+    counts = {}
+    for prefix, w in [("", np.ones_like(y)), ("w_", weights)]:
+        cum_pos = np.concatenate([[0], np.cumsum(w * y)])
+        cum_neg = np.concatenate([[0], np.cumsum(w * (1 - y))])
+        tp = cum_pos[-1] - cum_pos[first_pos_pred]
+        fp = cum_neg[-1] - cum_neg[first_pos_pred]
+        counts.update(
+            {
+                f"{prefix}tp": tp,
+                f"{prefix}fp": fp,
+                f"{prefix}fn": cum_pos[-1] - tp,
+                f"{prefix}tn": cum_neg[-1] - fp,
+            }
+        )
+    return counts
+
+
+def get_threshold_sweep_scores(
+    y_true: pd.Series,
+    y_pred_proba: pd.Series,
+    thresholds: np.ndarray = np.arange(0, 1, 0.01),
+    average: str = "macro",
+    zero_division: str = "warn",
+    sample_weight=None,
+) -> pd.DataFrame:
+    """Get scores from varying discrimination threshold, for all thresholds.
+
+    Same as get_threshold_tuning_scores(use_cumulative_counts=False), with
+    scores calculated from confusion matrix counts at every threshold. As
+    there, accuracy and balanced accuracy are unweighted and precision is
+    for the positive class only.
+    """
+    c = get_threshold_confusion_counts(
+        y_true, y_pred_proba, thresholds, sample_weight
+    )
+    scores_thresholds = {
+        "t": thresholds,
+        **mh.get_confusion_count_scores(c, average, zero_division),
+    }
+    df_thresholds = pd.DataFrame(scores_thresholds)
+    return df_thresholds
@@ -9,6 +9,7 @@
 
 
 import numpy as np
+from scipy import stats
 from statsmodels.stats import gof, power
 
 
@@ -60,3 +61,96 @@ def calc_chisquared_sample_size(
     )
 
     return np.ceil(sample_size)
+
+
+def calc_chisquared_sample_sizes(
+    baseline_conversion_rate_percentage: np.ndarray,
+    expected_uplift_percentage: np.ndarray,
+    power_percentage: np.ndarray = 80,
+    confidence_level_percentage: np.ndarray = 95,
+    max_iter: int = 50,
+    tol: float = 1e-10,
+) -> np.ndarray:
+    """Estimates minimum sample sizes for a grid of experiment inputs.
+
+    Vectorized equivalent of calc_chisquared_sample_size(). Inputs are
+      broadcast against each other, so a full grid of baseline conversion
+      rates, uplifts, powers and confidence levels is solved in one call.
+
+    With two bins, the Chi-squared test of proportions has one degree of
+      freedom and its power for nobs observations is
+      norm.sf(z - sqrt(nobs) * w) + norm.cdf(-z - sqrt(nobs) * w), where w is
+      the (Cohen's) effect size and z is the critical value of the test. This
+      is solved for sqrt(nobs) using Newton's method, starting from the
+      closed-form approximation (z + z_power) / w.
+
+    Args:
+      baseline_conversion_rate_percentage: Baseline conversion rates as a
+      percentage.
+      expected_uplift_percentage: Expected uplifts of the media experiment on
+      the baseline conversion rate as a percentage.
+      power_percentage: Statistical powers of the Chi-squared test as a
+      percent
+      confidence_level_percentage: Statistical confidence levels of the
+      Chi-squared test as a percentage.
+      max_iter: Maximum number of Newton iterations.
+      tol: Absolute tolerance on sqrt(nobs) used to stop iterating.
+
+    Returns:
+      sample_sizes: Estimated minimum sample sizes required for either a Test
+        or a Control group, with the broadcast shape of the inputs. Inputs
+        with no effect, or with baseline or expected conversion rates that
+        are not valid probabilities (eg. above 100%), give NaN.
+    """
+    baseline, uplift, power_pct, ci_level = np.broadcast_arrays(
+        *[
+            np.asarray(v, dtype=np.float64)
+            for v in [
+                baseline_conversion_rate_percentage,
+                expected_uplift_percentage,
+                power_percentage,
+                confidence_level_percentage,
+            ]
+        ]
+    )
+    null_probability = baseline / 100
+    alternative_probability = null_probability * (100 + uplift) / 100
+    alpha_proportion = (100 - ci_level) / 100
+    power_proportion = power_pct / 100
+
+    # get effect size, identical to gof.chisquare_effectsize(cohen=True) for
+    # two bins
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effect_size = np.abs(alternative_probability - null_probability) / (
+            np.sqrt(null_probability * (1 - null_probability))
+        )
+    # rates must be probabilities, as in the scalar solver
+    valid = (
+        np.isfinite(effect_size)
+        & (effect_size > 0)
+        & (null_probability > 0)
+        & (null_probability < 1)
+        & (alternative_probability > 0)
+        & (alternative_probability <= 1)
+    )
+    effect_size = np.where(valid, effect_size, np.nan)
+
+    # get critical value of two-sided test (Chi-squared with one dof)
+    z_crit = stats.norm.isf(alpha_proportion / 2)
+
+    # solve for square root of sample size
+    sqrt_nobs = (z_crit + stats.norm.ppf(power_proportion)) / effect_size
+    sqrt_nobs = np.where(valid, np.maximum(sqrt_nobs, tol), np.nan)
+    for _ in range(max_iter):
+        upper = sqrt_nobs * effect_size - z_crit
+        lower = -sqrt_nobs * effect_size - z_crit
+        power_diff = (
+            stats.norm.cdf(upper) + stats.norm.cdf(lower) - power_proportion
+        )
+        slope = effect_size * (stats.norm.pdf(upper) - stats.norm.pdf(lower))
+        step = np.where(valid, power_diff / slope, 0)
+        sqrt_nobs = np.maximum(sqrt_nobs - step, tol)
+        if np.nanmax(np.abs(step), initial=0) < tol:
+            break
+
+    return np.ceil(sqrt_nobs**2)
@@ -8,9 +8,12 @@
 # pylint: disable=too-many-locals,unused-argument,too-many-arguments
 
 import os
-from typing import Dict, List, Union
+from typing import Dict, Iterable, Iterator, List, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import categorical_helpers as ch
 import sql_helpers as sq
@@ -46,9 +49,24 @@ def shuffle_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def extract_data(query: str, gcp_auth_dict: Dict) -> pd.DataFrame:
-    """Retrieve data from Google BigQuery dataset."""
-    df = sq.run_sql_query(query, **gcp_auth_dict, show_df=False)
+def extract_data(
+    query: str,
+    gcp_auth_dict: Dict,
+    backend: str = "bigquery",
+    local_tables: Dict[str, str] = {},
+    cache_dir: str = "",
+    arrow_dtypes: bool = False,
+) -> pd.DataFrame:
+    """Retrieve data from Google BigQuery dataset (or local snapshot)."""
+    df = sq.run_sql_query(
+        query,
+        **gcp_auth_dict,
+        show_df=False,
+        backend=backend,
+        local_tables=local_tables,
+        cache_dir=cache_dir,
+        arrow_dtypes=arrow_dtypes,
+    )
     return df
 
 
@@ -70,6 +88,127 @@ def transform_data(
     return [df, cat_mapper_dicts]
 
 
+class DuplicateKeyFilter:
+    """Drop rows whose key was seen in the current or an earlier batch."""
+
+    def __init__(self, subset: List[str]):
+        """
+        Initializes DuplicateKeyFilter.
+
+        Args:
+            subset: columns that identify a row (keep first occurrence)
+        """
+        self.subset = subset
+        # sorted arrays of 64-bit hashes of keys seen so far, whose sizes
+        # decrease (so lookups and merges stay logarithmic)
+        self.seen_hashes = []
+        self.num_dropped = 0
+
+    def is_seen(self, hashes: np.ndarray) -> np.ndarray:
+        """Check if hashed keys were seen in earlier batches."""
+        seen = np.zeros(len(hashes), dtype=bool)
+        for level in self.seen_hashes:
+            pos = np.searchsorted(level, hashes).clip(max=len(level) - 1)
+            seen |= level[pos] == hashes
+        return seen
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Add hashed keys to keys seen so far."""
+        if len(hashes) == 0:
+            return
+        self.seen_hashes.append(np.unique(hashes))
+        while (
+            len(self.seen_hashes) > 1
+            and len(self.seen_hashes[-1]) >= len(self.seen_hashes[-2]) // 2
+        ):
+            level = self.seen_hashes.pop()
+            self.seen_hashes[-1] = np.union1d(self.seen_hashes[-1], level)
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop duplicates in batch, using keys seen in earlier batches."""
+        hashes = pd.util.hash_pandas_object(
+            df[self.subset], index=False
+        ).to_numpy()
+        keep = ~(
+            pd.Series(hashes).duplicated(keep="first").to_numpy()
+            | self.is_seen(hashes)
+        )
+        self.add(hashes[keep])
+        self.num_dropped += int((~keep).sum())
+        return df[keep]
+
+
+def transform_batch(
+    df: Union[pd.DataFrame, pa.RecordBatch],
+    datatypes_dict: Dict,
+    duplicate_filter: DuplicateKeyFilter,
+    column_mapper_dict: Dict[int, str],
+    cat_mapper_dicts: Dict[str, Dict[str, int]],
+    categoricals: List[str] = [],
+) -> pd.DataFrame:
+    """Transform features in a single batch of data."""
+    if isinstance(df, pa.RecordBatch):
+        df = df.to_pandas()
+    df = (
+        df.pipe(set_datatypes, datatypes_dict)
+        .pipe(duplicate_filter.filter)
+        .pipe(map_columns, column_mapper_dict)
+        .pipe(
+            ch.cast_categoricals_as_ints_incremental,
+            cat_mapper_dicts,
+            categoricals,
+        )
+    )
+    return df
+
+
+def stream_transform_data(
+    batches: Iterable[Union[pd.DataFrame, pa.RecordBatch]],
+    datatypes_dict: Dict,
+    duplicate_cols: List[str],
+    column_mapper_dict: Dict[int, str],
+    processed_data_dir: str,
+    split_type: str = "train",
+    categoricals: List[str] = [],
+) -> List[Union[str, List[Dict]]]:
+    """Transform features in batches of data and save to file on disk.
+
+    Streaming version of transform_data() followed by load_data(), for
+    record batches from sql_helpers.stream_query_record_batches(). Only one
+    batch and the hashes of the duplicate_cols keys are held in memory.
+
+    Integers used for categoricals match transform_data() if categories are
+    specified in datatypes_dict, else they are assigned in the order that
+    categories are first seen.
+    """
+    duplicate_filter = DuplicateKeyFilter(duplicate_cols)
+    # start from categories specified in datatypes
+    cat_mapper_dicts = {}
+    for c in categoricals:
+        categories = getattr(datatypes_dict.get(c), "categories", None)
+        categories = [] if categories is None else categories.tolist()
+        cat_mapper_dicts[c] = dict(zip(categories, range(len(categories))))
+    dfs_transformed: Iterator[pd.DataFrame] = (
+        transform_batch(
+            df_batch,
+            datatypes_dict,
+            duplicate_filter,
+            column_mapper_dict,
+            cat_mapper_dicts,
+            categoricals,
+        )
+        for df_batch in batches
+    )
+    load_data(dfs_transformed, processed_data_dir, split_type)
+    duplicates_str = ", ".join(duplicate_cols)
+    print(
+        f"Dropped {duplicate_filter.num_dropped:,} rows with duplicates by "
+        f"{duplicates_str}"
+    )
+    fpath = get_processed_data_fpath(processed_data_dir, split_type)
+    return [fpath, [{c: v} for c, v in cat_mapper_dicts.items()]]
+
+
 def create_combined_validation_data(
     df_train: pd.DataFrame, df_val: pd.DataFrame, datatypes_dict: Dict
 ) -> List[pd.DataFrame]:
@@ -87,17 +226,67 @@ def create_combined_validation_data(
     return [df_train, df_train_val]
 
 
-def load_data(
-    df: pd.DataFrame, processed_data_dir: str, split_type: str = "train"
-) -> None:
-    """Save data to file on local disk."""
+def get_processed_data_fpath(
+    processed_data_dir: str, split_type: str = "train"
+) -> str:
+    """Get path to file with processed data on local disk."""
     fpath = os.path.join(
         processed_data_dir, f"{split_type}_processed.parquet.gzip"
     )
-    df.to_parquet(fpath, index=False, compression="gzip", engine="pyarrow")
+    return fpath
+
+
+def load_data(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    processed_data_dir: str,
+    split_type: str = "train",
+) -> None:
+    """Save data to file on local disk.
+
+    If an iterable of DataFrames (batches) is passed, each batch is appended
+    to the file as a Parquet row group, so only one batch is held in memory.
+    """
+    fpath = get_processed_data_fpath(processed_data_dir, split_type)
+    if isinstance(df, pd.DataFrame):
+        df.to_parquet(fpath, index=False, compression="gzip", engine="pyarrow")
+    else:
+        writer, num_rows = None, 0
+        try:
+            for df_batch in df:
+                if writer is None:
+                    schema = get_batch_arrow_schema(df_batch)
+                    writer = pq.ParquetWriter(
+                        fpath, schema, compression="gzip"
+                    )
+                writer.write_table(
+                    pa.Table.from_pandas(
+                        df_batch, schema=schema, preserve_index=False
+                    )
+                )
+                num_rows += len(df_batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        print(f"Exported {num_rows:,} rows in batches")
     print(f"Exported data to {fpath}")
 
 
+def get_batch_arrow_schema(df: pd.DataFrame) -> pa.Schema:
+    """Get Arrow schema, that all batches are cast to, from first batch."""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    # use wide dictionary indices, since later batches can have more
+    # categories than the first batch
+    for k, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(
+                k,
+                field.with_type(
+                    pa.dictionary(pa.int32(), field.type.value_type)
+                ),
+            )
+    return schema
+
+
 def get_conv_rate(
     df: pd.DataFrame, label_col: str = "predicted_score_label"
 ) -> float:
@@ -271,3 +460,97 @@ def agg_kpis(df: pd.DataFrame, f: str) -> pd.DataFrame:
         )
     )
     return df_agg
+
+
+def get_sorted_category_codes(s: pd.Series) -> List:
+    """Encode categorical as codes of its categories, sorted as strings.
+
+    Missing values are encoded as -1 and unused categories are dropped.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        categories = s.cat.categories.astype(str).to_numpy()
+        cat_order = np.argsort(categories, kind="stable")
+        cat_ranks = np.empty(len(cat_order), dtype=np.intp)
+        cat_ranks[cat_order] = np.arange(len(cat_order))
+        cat_codes = s.cat.codes.to_numpy()
+        codes = np.where(cat_codes >= 0, cat_ranks[cat_codes], -1)
+        # drop unused categories, as groupby on strings does not show them
+        used = np.bincount(codes[codes >= 0], minlength=len(cat_order)) > 0
+        code_mapper = np.cumsum(used) - 1
+        codes = np.where(codes >= 0, code_mapper[codes], -1)
+        categories = categories[cat_order][used]
+    elif pd.api.types.is_string_dtype(s.dtype):
+        codes, categories = pd.factorize(s, sort=True)
+    else:
+        codes, categories = pd.factorize(s.astype(pd.StringDtype()), sort=True)
+    return [codes, pd.array(categories, dtype=pd.StringDtype())]
+
+
+def get_categorical_features_kpis(
+    df: pd.DataFrame, features: List[str]
+) -> pd.DataFrame:
+    """Aggregate KPIs by multiple categorical features, in a single pass.
+
+    Output is the same as concatenating the output of agg_kpis() for every
+    feature, with categories of each feature sorted by conversion rate.
+    """
+    pc, pv, vis, cr = [
+        "product_clicks",
+        "product_views",
+        "visitors",
+        "conversion_rate",
+    ]
+    # cast KPI columns once, with missing values excluded from sums
+    kpis = {
+        "revenue": df["revenue"],
+        "conversions": df["made_purchase_on_future_visit"],
+        pv: df[pv],
+        pc: df[pc],
+    }
+    kpi_values = {
+        k: np.nan_to_num(s.to_numpy(dtype=np.float64, na_value=np.nan))
+        for k, s in kpis.items()
+    }
+    visitor_counts = df["fullvisitorid"].notna().to_numpy(dtype=np.float64)
+
+    dfs_kpis = []
+    for f in features:
+        # encode feature as (sorted) codes, with missing values excluded
+        codes, categories = get_sorted_category_codes(df[f])
+        # count missing values in an extra bin, instead of filtering rows
+        n = len(categories)
+        codes = np.where(codes >= 0, codes, n)
+        sums = {
+            k: np.bincount(codes, weights=v, minlength=n + 1)[:n]
+            for k, v in kpi_values.items()
+        }
+        counts = np.bincount(codes, minlength=n + 1)[:n]
+        visitors = np.bincount(codes, weights=visitor_counts, minlength=n + 1)
+        df_kpis = pd.DataFrame(
+            {
+                "feature_category": categories,
+                "revenue": pd.array(sums["revenue"], dtype=pd.Float64Dtype()),
+                **{
+                    k: pd.array(sums[k].astype(np.int64), pd.Int64Dtype())
+                    for k in ["conversions", pv, pc]
+                },
+                vis: pd.array(
+                    visitors[:n].astype(np.int64), dtype=pd.Int64Dtype()
+                ),
+                "proportion": pd.array(
+                    100 * counts / counts.sum(), dtype=pd.Float64Dtype()
+                ),
+            }
+        )
+        df_kpis["ctr"] = 100 * df_kpis[pc] / df_kpis[pv]
+        df_kpis[cr] = 100 * df_kpis["conversions"] / df_kpis[vis]
+        df_kpis = df_kpis.sort_values(
+            by=[cr], ascending=False, ignore_index=True
+        )
+        df_kpis["feature_name"] = f
+        df_kpis["feature"] = df_kpis["feature_name"].str.cat(
+            df_kpis["feature_category"], sep="__"
+        )
+        dfs_kpis.append(df_kpis)
+    df_kpis = pd.concat(dfs_kpis, ignore_index=True)
+    return df_kpis
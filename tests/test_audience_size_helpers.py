@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Test utilities to estimate sizes of audience groups."""
+
+# pylint: disable=invalid-name
+
+import numpy as np
+import pandas as pd
+
+import audience_size_helpers as ash
+
+
+def test_get_top_group_kpis_cumulative_matches_get_top_group_kpis():
+    """KPIs from cumulative sums are equal up to floating-point round-off."""
+    rng = np.random.default_rng(0)
+    num_rows = 10_000
+    df = pd.DataFrame(
+        {
+            "score": rng.random(num_rows),
+            "label": pd.array(rng.integers(0, 2, num_rows), pd.Int64Dtype()),
+            "product_clicks": rng.integers(0, 3, num_rows),
+            "product_views": rng.integers(0, 10, num_rows),
+            "bounces": pd.array(rng.integers(0, 2, num_rows), pd.Int64Dtype()),
+            "revenue": rng.random(num_rows) * 100,
+        }
+    ).pipe(ash.sort_scores)
+    df.loc[::7, "revenue"] = np.nan
+    df.loc[::11, "bounces"] = pd.NA
+    num_groups = 10
+    audience_group_size = ash.get_group_size(df, num_groups)
+    df_kpis, df_kpis_cumulative = [
+        get_kpis(df, num_groups, audience_group_size)
+        for get_kpis in [
+            ash.get_top_group_kpis,
+            ash.get_top_group_kpis_cumulative,
+        ]
+    ]
+    pd.testing.assert_frame_equal(
+        df_kpis_cumulative,
+        df_kpis,
+        check_exact=False,
+        rtol=1e-9,
+    )
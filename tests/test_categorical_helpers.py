@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Test utilities to handle categorical data."""
+
+# pylint: disable=invalid-name
+
+import pandas as pd
+
+import categorical_helpers as ch
+
+# "organic" is declared, but not used in data
+SOURCE_DTYPE = pd.CategoricalDtype(["direct", "google", "organic", "youtube"])
+
+
+def get_data() -> pd.DataFrame:
+    """Create data with a categorical whose categories are not all used."""
+    df = pd.DataFrame(
+        {
+            "source": pd.Series(
+                ["youtube", "google", None, "direct", "youtube", "google"],
+                dtype=SOURCE_DTYPE,
+            ),
+            "hits": range(6),
+        }
+    )
+    return df
+
+
+def test_cast_categoricals_as_ints_unused_category():
+    """Mapper has all declared categories and integers are their codes."""
+    df, cat_mapper_dicts = ch.cast_categoricals_as_ints(get_data(), ["source"])
+    assert cat_mapper_dicts == [
+        {"source": {"direct": 0, "google": 1, "organic": 2, "youtube": 3}}
+    ]
+    assert df["source"].dtype == pd.Int64Dtype()
+    assert df["source"].tolist() == [3, 1, pd.NA, 0, 3, 1]
+
+
+def test_cast_categoricals_as_ints_incremental_matches_batch():
+    """Encoding a stream of batches matches encoding all data at once."""
+    df_batch, cat_mapper_dicts_batch = ch.cast_categoricals_as_ints(
+        get_data(), ["source"]
+    )
+    cat_mapper_dicts = {}
+    dfs = [
+        ch.cast_categoricals_as_ints_incremental(
+            df, cat_mapper_dicts, ["source"]
+        )
+        for df in [get_data().iloc[:3], get_data().iloc[3:]]
+    ]
+    assert [{c: v} for c, v in cat_mapper_dicts.items()] == (
+        cat_mapper_dicts_batch
+    )
+    pd.testing.assert_frame_equal(pd.concat(dfs), df_batch)
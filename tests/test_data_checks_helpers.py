@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Test utilities to check data quality."""
+
+# pylint: disable=invalid-name
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import data_checks_helpers as dch
+
+NUMERICALS = ["hits", "pageviews", "revenue"]
+CATEGORICALS = ["source", "os"]
+SUMMARY_COLS = [
+    "all_passed",
+    "total_tests",
+    "success_tests",
+    "failed_tests",
+    "SUCCESS",
+    "FAIL",
+]
+
+
+def get_data(num_rows: int, seed: int) -> pd.DataFrame:
+    """Create data with missing, constant and duplicated values."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "hits": rng.integers(1, 50, num_rows).astype(float),
+            "pageviews": rng.integers(1, 20, num_rows).astype(float),
+            "revenue": rng.random(num_rows),
+            "source": rng.choice(["google", "direct", "youtube"], num_rows),
+            "os": "Windows",
+        }
+    )
+    df.loc[rng.random(num_rows) < 0.05, "revenue"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize(
+    "curr_data",
+    [
+        get_data(1_000, 0),
+        get_data(800, 1).assign(hits=np.nan, os=lambda df: df["source"]),
+    ],
+)
+def test_check_data_stability_backends_match(curr_data: pd.DataFrame):
+    """Native and evidently data stability checks give the same summary."""
+    pytest.importorskip("evidently")
+    refer_data = get_data(1_000, 0)
+    df_native, df_evidently = [
+        dch.check_data_stability(
+            curr_data, refer_data, NUMERICALS, CATEGORICALS, backend=backend
+        )
+        .reindex(columns=SUMMARY_COLS)
+        .fillna(0)
+        .astype(int)
+        for backend in ["native", "evidently"]
+    ]
+    pd.testing.assert_frame_equal(df_native, df_evidently)
+
+
+def test_get_ks_test_from_quantiles_matches_one_sample_kstest():
+    """KS test against reference quantiles is a one-sample KS test."""
+    rng = np.random.default_rng(0)
+    quantile_levels = np.linspace(0, 1, 1_001)
+    refer_quantiles = np.quantile(rng.normal(size=100_000), quantile_levels)
+    curr_arr = rng.normal(0.1, 1, 500)
+    statistic, pvalue = dch.get_ks_test_from_quantiles(
+        curr_arr, refer_quantiles, quantile_levels
+    )
+    kst = stats.kstest(
+        curr_arr,
+        lambda x: dch.get_quantile_cdf(
+            np.atleast_1d(x), refer_quantiles, quantile_levels
+        ),
+    )
+    assert statistic == pytest.approx(kst.statistic)
+    assert pvalue == pytest.approx(kst.pvalue)
+
+
+def test_detect_features_drift_from_profile_matches_reference_data():
+    """Drift checks against profile are close to those against data."""
+    rng = np.random.default_rng(1)
+    refer_data = pd.DataFrame(
+        {
+            "hits": rng.normal(size=100_000),
+            "pageviews": rng.poisson(3, 100_000).astype(float),
+        }
+    )
+    refer_data.loc[:9, "hits"] = np.nan
+    curr_data = pd.DataFrame(
+        {
+            "hits": rng.normal(0.15, 1, 1_000),
+            "pageviews": rng.poisson(3, 1_000).astype(float),
+        }
+    )
+    refer_profile = dch.get_reference_profile(refer_data, ["hits"], [])
+    assert refer_profile["numericals"]["hits"]["null_count"] == 10
+
+    numericals = ["hits", "pageviews"]
+    refer_profile = dch.get_reference_profile(refer_data, numericals, [])
+    df_profile, _ = dch.detect_features_drift_from_profile(
+        curr_data, refer_profile, numericals, []
+    )
+    df_data, _ = dch.detect_features_drift(
+        curr_data, refer_data.dropna(), numericals, [], kst_params={}
+    )
+    assert df_profile["drift_detected"].tolist() == [True, False]
+    assert df_data["drift_detected"].tolist() == [True, False]
+
+
+def test_get_ks_test_method_honors_explicit_method():
+    """Only method 'auto' is replaced by a method chosen from sizes."""
+    assert dch.get_ks_test_method(1_000_000, 1_000, "exact") == "exact"
+    assert dch.get_ks_test_method(1_000_000, 1_000, "auto") == "asymp"
+    assert dch.get_ks_test_method(100, 100, "auto") == "exact"
+
+
+def test_detect_features_drift_keeps_explicit_exact_kstest():
+    """By default, the KS test and output columns are unchanged."""
+    rng = np.random.default_rng(2)
+    refer_data = pd.DataFrame({"hits": rng.normal(size=5_000)})
+    curr_data = pd.DataFrame({"hits": rng.normal(size=200)})
+    kst_params = dict(method="exact", alternative="two-sided")
+    for vectorized in [True, False]:
+        df_num_stats, _ = dch.detect_features_drift(
+            curr_data,
+            refer_data,
+            ["hits"],
+            [],
+            kst_params=kst_params,
+            vectorized=vectorized,
+        )
+        assert "kst_method_used" not in df_num_stats
+        assert df_num_stats["metric_value"].iloc[0] == pytest.approx(
+            stats.kstest(
+                refer_data["hits"], curr_data["hits"], **kst_params
+            ).pvalue
+        )
+
+
+def get_stability_data() -> pd.DataFrame:
+    """Create small data with every kind of stability issue."""
+    df = pd.DataFrame(
+        {
+            "a": [1.0, np.nan, 1.0, np.inf, np.nan],
+            "b": ["x", "", "x", "y", None],
+            "c": [7.0, 7.0, 7.0, 7.0, np.nan],
+            "e": np.nan,
+        }
+    ).assign(d=lambda df: df["a"])
+    return df
+
+
+def test_get_stability_counts():
+    """Counts of missing, constant, duplicated and empty columns and rows."""
+    stability_counts = dch.get_stability_counts(get_stability_data())
+    assert stability_counts == {
+        "num_columns": 5,
+        "num_rows": 5,
+        # infinite values and empty strings are missing
+        "num_columns_with_missing_values": 5,
+        "num_rows_with_missing_values": 5,
+        # c (one value) and e (no values)
+        "num_constant_columns": 2,
+        # rows 0 and 2
+        "num_duplicated_rows": 1,
+        # d is a copy of a
+        "num_duplicated_columns": 1,
+        "num_empty_columns": 1,
+        # row 4 (empty string in row 1 is not null)
+        "num_empty_rows": 1,
+    }
+
+
+def test_check_data_stability_native():
+    """Native data stability tests give evidently's statuses and summary."""
+    refer_data = get_stability_data()
+    test_results = dch.check_data_stability_native(refer_data, refer_data)
+    assert len(test_results) == 8
+    assert set(test_results.values()) == {"SUCCESS"}
+
+    # one more constant column, one more duplicated row and no empty rows
+    curr_data = pd.concat(
+        [refer_data.assign(b="x"), refer_data.iloc[[0]]], ignore_index=True
+    )
+    test_results = dch.check_data_stability_native(curr_data, refer_data)
+    failed = {
+        test for test, status in test_results.items() if status != "SUCCESS"
+    }
+    assert failed == {
+        "TestNumberOfConstantColumns",
+        "TestNumberOfDuplicatedRows",
+        "TestNumberOfEmptyRows",
+    }
+
+    # tests relative to size of reference data cannot be run without it
+    test_results = dch.check_data_stability_native(
+        refer_data, refer_data.iloc[:0]
+    )
+    errors = {
+        test for test, status in test_results.items() if status == "ERROR"
+    }
+    assert errors == {
+        "TestNumberOfRowsWithMissingValues",
+        "TestNumberOfDuplicatedRows",
+        "TestNumberOfEmptyRows",
+    }
+
+    df_stability = dch.check_data_stability(
+        curr_data, refer_data, ["a", "c", "d", "e"], ["b"], backend="native"
+    )
+    assert df_stability[
+        ["all_passed", "total_tests", "success_tests", "failed_tests"]
+    ].to_dict("records") == [
+        {
+            "all_passed": False,
+            "total_tests": 8,
+            "success_tests": 5,
+            "failed_tests": 3,
+        }
+    ]
+    assert df_stability[["SUCCESS", "FAIL"]].to_dict("records") == [
+        {"SUCCESS": 5, "FAIL": 3}
+    ]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Test utilities to execute BigQuery SQL, using a fake BigQuery client."""
+
+# pylint: disable=invalid-name,missing-class-docstring
+# pylint: disable=missing-function-docstring,unused-argument
+
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+
+import sql_helpers as sq
+
+SCHEMA = pa.schema([("fullvisitorid", pa.string()), ("hits", pa.int64())])
+BATCHES = [
+    pa.record_batch([pa.array(["a", "b"]), pa.array([1, 2])], schema=SCHEMA),
+    pa.record_batch([pa.array(["c"]), pa.array([3])], schema=SCHEMA),
+]
+
+
+class FakeRowIterator:
+    def __init__(self, batches: List[pa.RecordBatch]):
+        self.batches = batches
+        self.total_rows = sum(len(batch) for batch in batches)
+        self.arrow_iterable_kwargs = {}
+
+    def to_arrow(self) -> pa.Table:
+        return pa.Table.from_batches(self.batches, schema=SCHEMA)
+
+    def to_arrow_iterable(self, bqstorage_client=None, max_queue_size=None):
+        self.arrow_iterable_kwargs = dict(
+            bqstorage_client=bqstorage_client, max_queue_size=max_queue_size
+        )
+        yield from self.batches
+
+
+class FakeQueryJob:
+    def __init__(self, rows: FakeRowIterator):
+        self.rows = rows
+
+    def result(self) -> FakeRowIterator:
+        return self.rows
+
+
+class FakeBigQueryClient:
+    """Serves Arrow record batches as results of every query."""
+
+    def __init__(self, batches: List[pa.RecordBatch]):
+        self.rows = FakeRowIterator(batches)
+        self.queries = []
+
+    def query(self, query: str, job_config=None) -> FakeQueryJob:
+        self.queries.append(query)
+        return FakeQueryJob(self.rows)
+
+
+def test_stream_query_record_batches():
+    """Batches are streamed as served, with Storage Read API client."""
+    client, bqstorage_client = FakeBigQueryClient(BATCHES), object()
+    batches = list(
+        sq.stream_query_record_batches(
+            "SELECT 1", client, bqstorage_client, max_queue_size=2
+        )
+    )
+    assert batches == BATCHES
+    assert client.queries == ["SELECT 1"]
+    assert client.rows.arrow_iterable_kwargs == dict(
+        bqstorage_client=bqstorage_client, max_queue_size=2
+    )
+
+
+def test_fetch_query_arrow_table():
+    """Batches are combined into one table."""
+    table = sq.fetch_query_arrow_table("SELECT 1", FakeBigQueryClient(BATCHES))
+    assert table.schema == SCHEMA
+    assert table.to_pydict() == {
+        "fullvisitorid": ["a", "b", "c"],
+        "hits": [1, 2, 3],
+    }
+
+
+def test_fetch_query_arrow_table_empty_results():
+    """Empty results keep the schema of the query results."""
+    empty_batch = pa.record_batch(
+        [pa.array([], pa.string()), pa.array([], pa.int64())], schema=SCHEMA
+    )
+    table = sq.fetch_query_arrow_table(
+        "SELECT 1", FakeBigQueryClient([empty_batch])
+    )
+    assert table.num_rows == 0
+    assert table.schema == SCHEMA
+
+
+def test_execute_sql_query_arrow_dtypes():
+    """Results are returned with Arrow datatypes, using given clients."""
+    client = FakeBigQueryClient(BATCHES)
+    df = sq.execute_sql_query(
+        "SELECT 1",
+        "fake-project",
+        None,
+        arrow_dtypes=True,
+        bq_clients=[client, None],
+    )
+    assert client.queries == ["SELECT 1"]
+    assert df.dtypes.tolist() == [
+        pd.ArrowDtype(pa.string()),
+        pd.ArrowDtype(pa.int64()),
+    ]
+    assert df["hits"].tolist() == [1, 2, 3]
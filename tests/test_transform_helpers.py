@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Test utilities to transform data."""
+
+# pylint: disable=invalid-name
+
+import numpy as np
+import pandas as pd
+
+import transform_helpers as th
+
+
+def test_get_categorical_features_kpis_matches_agg_kpis():
+    """KPIs of all features match agg_kpis(), with nullable datatypes."""
+    rng = np.random.default_rng(0)
+    num_rows = 5_000
+    df = pd.DataFrame(
+        {
+            "os": rng.choice(
+                ["Windows", "Macintosh", None, "Linux"], num_rows
+            ),
+            "source": rng.choice(["google", "direct", "youtube"], num_rows),
+            "revenue": rng.random(num_rows),
+            "made_purchase_on_future_visit": rng.integers(0, 2, num_rows),
+            "product_views": rng.integers(0, 5, num_rows),
+            "product_clicks": rng.integers(0, 3, num_rows),
+            "fullvisitorid": np.arange(num_rows).astype(str),
+        }
+    )
+    features = ["os", "source"]
+    df_kpis = th.get_categorical_features_kpis(df, features)
+    assert df_kpis["proportion"].dtype == pd.Float64Dtype()
+    df_kpis_expected = pd.concat(
+        [th.agg_kpis(df, f) for f in features], ignore_index=True
+    )
+    # proportions of agg_kpis() are Arrow-backed with pandas>=3
+    pd.testing.assert_frame_equal(
+        df_kpis,
+        df_kpis_expected.astype({"proportion": pd.Float64Dtype()}),
+        check_exact=False,
+    )